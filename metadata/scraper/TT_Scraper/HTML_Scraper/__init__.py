@@ -2,21 +2,28 @@ import os
 import os.path
 import pytz
 import requests
-import browser_cookie3
 from bs4 import BeautifulSoup
 import json
 from datetime import datetime, timedelta
 import time
+import threading
 import statistics
 import traceback
 from pprint import pprint
 from pathlib import Path
 
+from ._adaptive_rate import HEALTHY, FORBIDDEN, TIMEOUT
+from ._phase_timer import PhaseTimers
+from ._throughput_tracker import ThroughputTracker
+from ._response_recorder import url_key
+
 class HTML_Scraper:
         def __init__(self,
                     wait_time = 0.35,
                     output_files_fp = "data/", 
-                    browser_name = None):
+                    browser_name = None,
+                    cookie_refresh_interval = 600,
+                    base_url = None):
             
             # output folder
             Path(output_files_fp).mkdir(parents=True, exist_ok=True)
@@ -24,6 +31,10 @@ class HTML_Scraper:
             # constants
             self.IST = pytz.timezone('Europe/Berlin')
             self.ALLOW_REPEATED_ERRORS = 20
+            self.MAX_RETRY_ATTEMPTS = 5
+            self.RETRY_BASE_DELAY = 3 # seconds, doubled with every attempt
+            self.RETRY_MAX_DELAY = 300
+            self.SLIDE_CONCURRENCY = 6 # parallel downloads of the pictures and the audio of one slide
             self.VIDEOS_OUT_FP = output_files_fp
             self.WAIT_TIME = wait_time
             self.ITER_TIME = self.WAIT_TIME
@@ -34,45 +45,95 @@ class HTML_Scraper:
             self.already_scraped_count = 0 
             self.total_videos = 0 
             self.iterations = 0
-            self.iter_times = []
+            self.throughput = ThroughputTracker()
+            self.bytes_received = 0
+            self.bytes_written = 0
+            self.last_bytes_received = 0
             self.mean_iter_time = 0
             self.queue_eta = None
+            self.stats_lock = threading.Lock()
+
+            # global request budget and its adaptive controller, set by scrape_list if requested
+            self.rate_limiter = None
+            self.rate_controller = None
+
+            # per-phase timers, turned on by scrape_list(metrics_interval=...)
+            self.timers = PhaseTimers(enabled=False)
+
+            # watches the free space of the output folder, set by scrape_list if requested
+            self.disk_watchdog = None
+            self.metrics_fp = None
+            self.metrics_interval = 60
+            self.last_metrics_snapshot = 0
+
+            # replay against a local stand-in server: https://<host>/<path> is requested as <base_url>/<host>/<path>
+            self.base_url = base_url
+            # archives all responses for offline replay, set by scrape_list(record_fp=...)
+            self.recorder = None
         
             self.browser_name = browser_name
-            # request headers
+            # browser cookies are cached per browser and refreshed every cookie_refresh_interval seconds or after a 403
+            self.cookie_refresh_interval = cookie_refresh_interval
+            self.cookie_providers = {}
+            self.cookie_lock = threading.Lock()
+            self.merged_cookies = None
+            # persistent session with connection pools
+            self._init_session()
+            # request headers, refreshed at most once per generation after a RetryLaterError
+            self.headers_lock = threading.Lock()
+            self.headers_generation = 0
             self._init_request_headers()
 
             # logging
             self.log = self._init_logger()
         
-        from ._init_request_headers import _init_request_headers
-        from ._logging_queue_progress import _logging_queue_progress
+        from ._init_request_headers import _init_request_headers, _refresh_request_headers
+        from ._init_session import _init_session, _mount_session_adapters
+        from ._logging_queue_progress import _logging_queue_progress, _track_progress, _count_received_bytes, _count_written_bytes, _check_disk_usage
         from ._init_logger import _init_logger
         from ._clear_console import _clear_console
+        from ._adaptive_rate import _report_rate_event
+        from ._cookie_provider import _apply_browser_cookies
+        from ._phase_timer import _write_metrics_snapshot
         
         def info(self):
                 pprint(vars(self))
         
-        def request_and_retain_cookies(self, url, browser_name=None):
+        def request_and_retain_cookies(self, url, browser_name=None, allow_redirects=False, stream=False):
                 if browser_name is None:
                         browser_name = self.browser_name  # Use the stored browser_name if not provided
 
+                cookie_provider = None
                 if browser_name is not None:
-                        self.cookies = getattr(browser_cookie3, browser_name)(domain_name='.tiktok.com')  # Inspired by pyktok
-
-                r = requests.get(url,
-                        allow_redirects=False, # may have to set to True
-                        headers=self.headers,
-                        cookies=self.cookies,
-                        timeout=20,
-                        stream=False)
-                
-                # retain any new cookies that got set in this request
-                self.cookies = r.cookies
+                        cookie_provider = self._apply_browser_cookies(browser_name)  # Inspired by pyktok
 
-                return r
+                if self.rate_limiter is not None:
+                        self.rate_limiter.acquire()
 
+                request_url = url
+                if self.base_url is not None and url.startswith(("https://", "http://")):
+                        request_url = self.base_url.rstrip("/") + "/" + url_key(url)
 
+                # the session reuses pooled connections and keeps cookies set by responses in its jar
+                try:
+                        r = self.session.get(request_url,
+                                allow_redirects=allow_redirects, # may have to set to True
+                                headers=self.headers,
+                                timeout=20,
+                                stream=stream)
+                except requests.exceptions.Timeout:
+                        self._report_rate_event(TIMEOUT)
+                        raise
 
-        
+                if self.recorder is not None:
+                        self.recorder.record(url, r)
 
+                if r.status_code == 403:
+                        self._report_rate_event(FORBIDDEN)
+                        # the browser session may have been renewed in the meantime
+                        if cookie_provider is not None:
+                                cookie_provider.invalidate()
+                elif r.status_code < 400:
+                        self._report_rate_event(HEALTHY)
+
+                return r
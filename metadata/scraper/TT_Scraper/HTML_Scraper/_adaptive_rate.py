@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import deque
+
+# events reported by the scraper
+HEALTHY = "ok"
+FORBIDDEN = "forbidden" # 403
+EMPTY = "empty" # page without (usable) rehydration data
+TIMEOUT = "timeout"
+
+class AdaptiveRateController:
+    """
+    AIMD controller for the request rate of a RateLimiter.
+    Every healthy response adds increase / rate requests per second (about +increase per second),
+    403s, empty rehydration payloads and timeouts multiply the rate by decrease_factor,
+    at most once per cooldown seconds, so a burst of failures of concurrent requests
+    counts as one.
+    """
+    def __init__(self, rate_limiter, min_rate = 0.2, max_rate = 20, increase = 0.05, decrease_factor = 0.5, cooldown = 5, history_size = 1000):
+        self.rate_limiter = rate_limiter
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+
+        self.lock = threading.Lock()
+        self.rate = min(max_rate, max(min_rate, rate_limiter.rate))
+        self.rate_limiter.set_rate(self.rate)
+        self.last_decrease = 0
+        self.event_counts = {HEALTHY: 0, FORBIDDEN: 0, EMPTY: 0, TIMEOUT: 0}
+        # (timestamp, event, old rate, new rate) of every decrease and every 100th increase
+        self.history = deque(maxlen=history_size)
+
+    @property
+    def current_rate(self):
+        return self.rate
+
+    def record(self, event):
+        with self.lock:
+            self.event_counts[event] = self.event_counts.get(event, 0) + 1
+            old_rate = self.rate
+            now = time.time()
+
+            if event == HEALTHY:
+                self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+                if self.event_counts[HEALTHY] % 100 == 0:
+                    self.history.append((now, event, old_rate, self.rate))
+            elif now - self.last_decrease >= self.cooldown:
+                self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                self.last_decrease = now
+                self.history.append((now, event, old_rate, self.rate))
+
+            if self.rate != old_rate:
+                self.rate_limiter.set_rate(self.rate)
+
+    def snapshot(self):
+        """
+        Current state for monitoring.
+        """
+        with self.lock:
+            return {"rate": round(self.rate, 3),
+                    "min_rate": self.min_rate,
+                    "max_rate": self.max_rate,
+                    "events": dict(self.event_counts),
+                    "history": [{"time": t, "event": e, "old_rate": round(o, 3), "new_rate": round(n, 3)} for t, e, o, n in self.history]}
+
+def _report_rate_event(self, event):
+    if self.rate_controller is not None:
+        self.rate_controller.record(event)
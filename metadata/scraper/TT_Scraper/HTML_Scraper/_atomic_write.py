@@ -0,0 +1,20 @@
+import os
+import threading
+from contextlib import contextmanager
+
+@contextmanager
+def atomic_write(path, mode = "wb", **open_kw):
+    """
+    Yields a temporary file next to path that replaces path once the block completes,
+    so a crash or a full disk never leaves a truncated file under the final name.
+    On an error the temporary file is removed and path stays as it was.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        with open(tmp_path, mode, **open_kw) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,52 @@
+import threading
+import time
+
+import browser_cookie3
+
+class BrowserCookieProvider:
+    """
+    Cookies of a local browser (browser_cookie3), loaded once and cached.
+    Reading the browser's cookie database means opening and decrypting it,
+    so it is only read again after refresh_interval seconds or after invalidate()
+    (e.g. on a 403). version is increased with every load.
+    """
+    def __init__(self, browser_name, refresh_interval = 600, domain_name = ".tiktok.com"):
+        self.browser_name = browser_name
+        self.refresh_interval = refresh_interval
+        self.domain_name = domain_name
+        self.lock = threading.Lock()
+        self.jar = None
+        self.version = 0
+        self.loaded_at = 0
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded_at = 0
+
+    def cookies(self):
+        """
+        Returns (cookie jar, version), reloading the browser cookies if they are stale.
+        """
+        with self.lock:
+            if self.jar is None or time.monotonic() - self.loaded_at >= self.refresh_interval:
+                self.jar = getattr(browser_cookie3, self.browser_name)(domain_name=self.domain_name)
+                self.loaded_at = time.monotonic()
+                self.version += 1
+            return self.jar, self.version
+
+def _apply_browser_cookies(self, browser_name):
+    """
+    Merges the (cached) cookies of browser_name into the session's jar,
+    only when they were (re)loaded since the last merge.
+    Cookies set by responses stay in the jar until the browser cookies are refreshed.
+    """
+    provider = self.cookie_providers.get(browser_name)
+    if provider is None:
+        with self.cookie_lock:
+            provider = self.cookie_providers.setdefault(browser_name, BrowserCookieProvider(browser_name, self.cookie_refresh_interval))
+    jar, version = provider.cookies()
+    with self.cookie_lock:
+        if self.merged_cookies != (browser_name, version):
+            self.session.cookies.update(jar)
+            self.merged_cookies = (browser_name, version)
+    return provider
@@ -0,0 +1,90 @@
+import shutil
+import threading
+import time
+
+class DiskWatchdog:
+    """
+    Background thread that watches the free space of the output folder.
+
+    Every `interval` seconds it measures how many bytes per second the scraper
+    wrote (via bytes_written()) and projects the time until only `reserve_bytes`
+    are left. Below the reserve, wait_for_space() either blocks until space
+    is freed (on_full = "pause") or returns False so the queue can stop (on_full = "stop").
+    """
+    def __init__(self, path, bytes_written, reserve_bytes, on_full = "stop", interval = 10, log = None):
+        if on_full not in ("stop", "pause"):
+            raise ValueError(f"on_full must be 'stop' or 'pause', not {on_full!r}")
+        self.path = path
+        self.bytes_written = bytes_written
+        self.reserve_bytes = reserve_bytes
+        self.on_full = on_full
+        self.interval = interval
+        self.log = log
+
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.free = None
+        self.used = None
+        self.write_rate = 0.0 # bytes/sec
+        self.last_check = None
+        self.last_bytes_written = 0
+        self.check()
+
+        self.thread = threading.Thread(target=self._run, name="disk-watchdog", daemon=True)
+        self.thread.start()
+
+    @property
+    def is_full(self):
+        return self.free is not None and self.free <= self.reserve_bytes
+
+    @property
+    def seconds_until_full(self):
+        """
+        Projected time until the reserve is reached, None if nothing is being written.
+        """
+        if self.free is None or self.write_rate <= 0:
+            return None
+        return max(0, self.free - self.reserve_bytes) / self.write_rate
+
+    def check(self):
+        total, used, free = shutil.disk_usage(self.path)
+        now = time.monotonic()
+        bytes_written = self.bytes_written()
+        with self.condition:
+            if self.last_check is not None and now > self.last_check:
+                self.write_rate = (bytes_written - self.last_bytes_written) / (now - self.last_check)
+            self.last_check = now
+            self.last_bytes_written = bytes_written
+            self.free = free
+            self.used = used
+            self.condition.notify_all()
+
+    def wait_for_space(self):
+        """
+        Returns True if scraping can go on, False if the queue should stop.
+        In pause mode, blocks while the disk is full.
+        """
+        with self.condition:
+            if not self.is_full:
+                return True
+            if self.on_full == "stop":
+                return False
+            if self.log is not None:
+                self.log.warning(f"Disk full ({self.free / 1e9:.2f} GB free), pausing until space is freed...")
+            while self.is_full and not self.stopped:
+                self.condition.wait()
+            return not self.is_full
+
+    def close(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait(self.interval)
+                if self.stopped:
+                    return None
+            self.check()
@@ -1,6 +1,3 @@
-import requests
-import browser_cookie3
-
 def _init_request_headers(self):
     # Request Headers
     self.headers = {'Accept-Encoding': 'gzip, deflate, sdch',
@@ -15,4 +12,18 @@ def _init_request_headers(self):
     self.context_dict = {'viewport': {'width': 0, 'height': 0},
                     'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:58.0) Gecko/20100101 Firefox/58.0'}
 
-    self.cookies = dict()
\ No newline at end of file
+    # start over with an empty cookie jar
+    self.session.cookies.clear()
+    self.cookies = self.session.cookies
+    # browser cookies are merged in again with the next request
+    self.merged_cookies = None
+    self.headers_generation += 1
+
+def _refresh_request_headers(self, generation):
+    """
+    Starts over with fresh headers and cookies after a request that was sent with the given
+    generation of them failed, unless another thread has already refreshed them since.
+    """
+    with self.headers_lock:
+        if self.headers_generation == generation:
+            self._init_request_headers()
@@ -0,0 +1,19 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+def _init_session(self, pool_maxsize = 10):
+    # one persistent session for all requests: keep-alive connections and a cookie jar
+    self.session = requests.Session()
+    self._mount_session_adapters(pool_maxsize)
+
+def _mount_session_adapters(self, pool_maxsize):
+    """
+    (Re)mounts the connection pools of the session.
+    urllib3 keeps one pool per host (www.tiktok.com, the video CDN, the image CDN, ...),
+    pool_maxsize is the number of kept-alive connections per host.
+    Should be at least the number of threads using the session.
+    """
+    adapter = HTTPAdapter(pool_connections = 10, pool_maxsize = pool_maxsize)
+    self.session.mount("https://", adapter)
+    self.session.mount("http://", adapter)
+    self.pool_maxsize = pool_maxsize
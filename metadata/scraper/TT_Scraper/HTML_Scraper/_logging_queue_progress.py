@@ -1,21 +1,29 @@
 from datetime import datetime, timedelta
 import time
 import sys
-import statistics
 import traceback
-import shutil
+
+def _count_received_bytes(self, nbytes):
+    with self.stats_lock:
+        self.bytes_received += nbytes
+
+def _count_written_bytes(self, nbytes):
+    with self.stats_lock:
+        self.bytes_written += nbytes
+
+def _track_progress(self, metadata_package):
+    """
+    Updates the throughput statistics with a finished video (O(1)).
+    """
+    bytes_received = self.bytes_received
+    self.throughput.update(items=1, nbytes=bytes_received - self.last_bytes_received, errors=1 if "error_code" in metadata_package else 0)
+    self.last_bytes_received = bytes_received
 
 def _logging_queue_progress(self):
 
-    # calculate ETA
-    self.iter_times.insert(0, self.ITER_TIME)
-    if len(self.iter_times) > 500:
-        self.iter_times.pop()
-    if self.iterations % 15 == 0 and self.iterations < 2_000:
-        self.mean_iter_time = statistics.mean(self.iter_times)
-        self.queue_eta = str(timedelta(seconds=int((self.queue_length - self.iterations) * self.mean_iter_time)))
-    elif (self.iterations) % 501 == 0:
-        self.queue_eta = str(timedelta(seconds=int((self.queue_length - self.iterations) * self.mean_iter_time)))
+    # ETA, recalculated by self.throughput with every finished video
+    self.mean_iter_time = self.throughput.seconds_per_item
+    self.queue_eta = self.throughput.eta
     
     if self.total_videos > 0 or self.already_scraped_count > 0:
         self.log.info("Database Information:")
@@ -28,34 +36,31 @@ def _logging_queue_progress(self):
 
     self.log.info(str(round(self.ITER_TIME, 2)) + " sec. iteration time")
     self.log.info(str(round(self.mean_iter_time, 2)) + " sec. per video (averaged)")
+    self.log.info(f"{self.throughput.items_per_sec:.2f} videos/sec (current: {self.throughput.instant_items_per_sec:.2f}), {self.throughput.mb_per_sec:.2f} MB/sec")
+    self.log.info(f"Error rate (last {self.throughput.window} videos): {self.throughput.error_rate:.1%}")
     self.log.info(f"ETA (current queue): {self.queue_eta}\n***\n")
 
-    #self.log.info("Disk Information:")
-    #_check_disk_usage((self.already_scraped_count + self.iterations), self.mean_iter_time, self.VIDEOS_OUT_FP, stop_at_tb = 0.01)
+    if self.rate_controller is not None:
+        self.log.info(f"{self.rate_controller.current_rate:.2f} requests/sec (adaptive)\n")
+
+    self._write_metrics_snapshot()
+
+    if self.disk_watchdog is not None:
+        self._check_disk_usage()
     
     return None
 
-def _check_disk_usage(self, scraped_count, iter_time, dir, stop_at_tb = 0, only_videos_in_dir = False):
-        stop_at = stop_at_tb #TB left
-
-        total, used, free = shutil.disk_usage(dir)
-        free = free * pow(10, -12) # in TB
-        free -= stop_at
-        used = used * pow(10, -12) # in TB
-        
-        self.log.info(u"%.2f" % free, "free space (in TB)")
-        self.log.info(u"%.2f" % used, "used space (in TB)")
-
-        if only_videos_in_dir:
-            # how long until full
-            avg_video_size = used / scraped_count
-            vids_until_full = int(free / avg_video_size)
-            time_until_full = (vids_until_full * iter_time) #seconds
-            self.log.info(f"{int(vids_until_full):,} videos until full")
-            self.log.info(str(timedelta(seconds=int(time_until_full))), "hours until full")
-
-        self.log.info("\n")
-
-        if float(free) < stop_at:
-            self.log.info("System full")
-            sys.exit(0)
+def _check_disk_usage(self):
+    """
+    Logs free and used space of the output folder and the projected time until
+    the disk watchdog's reserve is reached, based on the bytes/sec written by the scraper.
+    """
+    watchdog = self.disk_watchdog
+    self.log.info("Disk Information:")
+    self.log.info(f"{watchdog.free / 1e12:.3f} TB free space ({(watchdog.free - watchdog.reserve_bytes) / 1e12:.3f} TB above reserve)")
+    self.log.info(f"{watchdog.used / 1e12:.3f} TB used space")
+    self.log.info(f"{watchdog.write_rate / 1e6:.2f} MB/sec written")
+    seconds_until_full = watchdog.seconds_until_full
+    if seconds_until_full is not None:
+        self.log.info(f"{timedelta(seconds=int(seconds_until_full))} until full")
+    self.log.info("\n")
@@ -0,0 +1,135 @@
+import bisect
+import json
+import threading
+import time
+
+# upper bounds of the histogram buckets in seconds, from 0.5 ms to ~10 min in steps of 25%
+BUCKET_BOUNDS = [0.0005 * 1.25 ** i for i in range(64)]
+
+class PhaseHistogram:
+    """
+    Fixed-size histogram of the durations of one phase, plus bytes transferred.
+    Percentiles are read from the buckets (accurate to about 25%).
+    """
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.total_bytes = 0
+
+    def add(self, seconds, nbytes = 0):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total_time += seconds
+        self.max_time = max(self.max_time, seconds)
+        self.total_bytes += nbytes
+
+    def percentile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.buckets):
+            cumulative += n
+            if cumulative >= rank:
+                return min(BUCKET_BOUNDS[i], self.max_time) if i < len(BUCKET_BOUNDS) else self.max_time
+        return self.max_time
+
+    def summary(self):
+        return {"count": self.count,
+                "mean": self.total_time / self.count if self.count else None,
+                "p50": self.percentile(0.50),
+                "p95": self.percentile(0.95),
+                "p99": self.percentile(0.99),
+                "max": self.max_time,
+                "bytes": self.total_bytes}
+
+class Phase:
+    """
+    Context manager measuring one execution of a phase.
+    Only successful executions are recorded, failures are counted by the error statistics.
+    """
+    __slots__ = ("timers", "name", "start", "nbytes")
+
+    def __init__(self, timers, name):
+        self.timers = timers
+        self.name = name
+        self.nbytes = 0
+
+    def add_bytes(self, nbytes):
+        self.nbytes += nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.timers.record(self.name, time.perf_counter() - self.start, self.nbytes)
+        return False
+
+class NullPhase:
+    """
+    Shared no-op phase, used while instrumentation is turned off.
+    """
+    __slots__ = ()
+
+    def add_bytes(self, nbytes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_PHASE = NullPhase()
+
+class PhaseTimers:
+    """
+    Per-phase timers of the scraper hot path (html_fetch, html_parse, filter, media_download, disk_write).
+    Turned off, phase() returns NULL_PHASE and nothing is measured.
+    """
+    def __init__(self, enabled = False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_PHASE
+        return Phase(self, name)
+
+    def record(self, name, seconds, nbytes = 0):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = PhaseHistogram()
+            histogram.add(seconds, nbytes)
+
+    def snapshot(self):
+        with self.lock:
+            return {name: histogram.summary() for name, histogram in self.histograms.items()}
+
+def _write_metrics_snapshot(self, force = False):
+    """
+    Appends a JSON line with the phase histograms and queue statistics to the metrics file,
+    at most every metrics_interval seconds unless forced.
+    """
+    if not self.timers.enabled or self.metrics_fp is None:
+        return None
+    now = time.time()
+    if not force and now - self.last_metrics_snapshot < self.metrics_interval:
+        return None
+    self.last_metrics_snapshot = now
+
+    snapshot = {"time": now,
+                "iterations": self.iterations,
+                "queue_length": self.queue_length,
+                "total_errors": self.total_errors,
+                "phases": self.timers.snapshot()}
+    if self.rate_controller is not None:
+        snapshot["rate"] = self.rate_controller.current_rate
+    with open(self.metrics_fp, "a", encoding="utf-8") as f:
+        f.write(json.dumps(snapshot) + "\n")
@@ -0,0 +1,37 @@
+import threading
+import time
+
+class RateLimiter:
+    """
+    Thread-safe token bucket that spreads requests over a global
+    requests-per-second budget. Shared by all threads of one scraper.
+    """
+    def __init__(self, requests_per_second, burst = 1):
+        self.lock = threading.Lock()
+        self.rate = float(requests_per_second)
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.last_refill = time.monotonic()
+
+    def set_rate(self, requests_per_second):
+        with self.lock:
+            self._refill()
+            self.rate = float(requests_per_second)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self):
+        """
+        Blocks until a request may be sent.
+        """
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return None
+                wait_time_left = (1 - self.tokens) / self.rate
+            time.sleep(wait_time_left)
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+import threading
+
+from ._atomic_write import atomic_write
+
+INDEX_FILENAME = "index.jsonl"
+# describe the transfer, not the content: bodies are archived decoded and complete
+TRANSFER_HEADERS = ("content-encoding", "transfer-encoding", "content-length", "connection", "keep-alive")
+
+def url_key(url):
+    """
+    https://www.tiktok.com/@tiktok/video/1?a=b -> www.tiktok.com/@tiktok/video/1?a=b
+    """
+    return url.split("://", 1)[1] if "://" in url else url
+
+class ResponseRecorder:
+    """
+    Archives the responses of a scraper (status, headers and raw body) for offline replay:
+        <archive_fp>/index.jsonl               {"url": ..., "status": ..., "headers": {...}, "body": <sha256>, "size": ...}
+        <archive_fp>/bodies/<sha256[:2]>/<sha256>
+    Every body is stored once. Streamed responses are read completely before they are handed on,
+    the scraper reads them from memory then. The last response of a URL wins on replay.
+    """
+    def __init__(self, archive_fp):
+        self.archive_fp = archive_fp
+        os.makedirs(os.path.join(archive_fp, "bodies"), exist_ok=True)
+        self.lock = threading.Lock()
+        self.index_file = open(os.path.join(archive_fp, INDEX_FILENAME), "a", encoding="utf-8")
+        self.n_responses = 0
+
+    def record(self, url, response):
+        """
+        Archives a requests response to url.
+        """
+        self.add(url, response.status_code, dict(response.headers), response.content)
+
+    def add(self, url, status, headers, body):
+        sha256 = hashlib.sha256(body).hexdigest()
+        path = body_path(self.archive_fp, sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with atomic_write(path) as f:
+                f.write(body)
+        headers = {key: value for key, value in headers.items() if key.lower() not in TRANSFER_HEADERS}
+        line = json.dumps({"url": url, "status": status, "headers": headers, "body": sha256, "size": len(body)}, ensure_ascii=False)
+        with self.lock:
+            self.index_file.write(line + "\n")
+            self.index_file.flush()
+            self.n_responses += 1
+
+    def close(self):
+        with self.lock:
+            self.index_file.close()
+
+def body_path(archive_fp, sha256):
+    return os.path.join(archive_fp, "bodies", sha256[:2], sha256)
+
+def load_archive(archive_fp):
+    """
+    Returns {url_key: entry} of an archive, see ResponseRecorder.
+    """
+    entries = {}
+    with open(os.path.join(archive_fp, INDEX_FILENAME), "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                continue
+            entry = json.loads(line)
+            entries[url_key(entry["url"])] = entry
+    return entries
@@ -0,0 +1,116 @@
+import time
+from datetime import timedelta
+
+class ThroughputTracker:
+    """
+    Rolling throughput statistics with O(1) work per update.
+
+    An EWMA of the seconds per item gives the smoothed rate and the ETA,
+    a fixed-size ring buffer of the last `window` updates gives the
+    windowed rate, MB/sec and error rate.
+    """
+    def __init__(self, total = 0, window = 500, alpha = 0.05):
+        self.total = total
+        self.window = window
+        self.alpha = alpha
+
+        self.count = 0
+        self.errors = 0
+        self.total_bytes = 0
+        self.start_time = time.monotonic()
+        self.last_time = self.start_time
+        self.last_duration = None
+        self.ewma_seconds = None
+
+        # ring buffer of (duration, items, bytes, errors) and running sums over it
+        self.ring = [None] * window
+        self.ring_pos = 0
+        self.ring_len = 0
+        self.window_seconds = 0.0
+        self.window_items = 0
+        self.window_bytes = 0
+        self.window_errors = 0
+
+    def update(self, items = 1, nbytes = 0, errors = 0, now = None):
+        if now is None:
+            now = time.monotonic()
+        duration = now - self.last_time
+        self.last_time = now
+        self.last_duration = duration
+
+        self.count += items
+        self.errors += errors
+        self.total_bytes += nbytes
+
+        if items > 0:
+            seconds_per_item = duration / items
+            if self.ewma_seconds is None:
+                self.ewma_seconds = seconds_per_item
+            else:
+                self.ewma_seconds += self.alpha * (seconds_per_item - self.ewma_seconds)
+
+        # replace the oldest entry of the ring buffer
+        if self.ring_len == self.window:
+            old_duration, old_items, old_bytes, old_errors = self.ring[self.ring_pos]
+            self.window_seconds -= old_duration
+            self.window_items -= old_items
+            self.window_bytes -= old_bytes
+            self.window_errors -= old_errors
+        else:
+            self.ring_len += 1
+        self.ring[self.ring_pos] = (duration, items, nbytes, errors)
+        self.ring_pos = (self.ring_pos + 1) % self.window
+        self.window_seconds += duration
+        self.window_items += items
+        self.window_bytes += nbytes
+        self.window_errors += errors
+
+    @property
+    def seconds_per_item(self):
+        return self.ewma_seconds or 0
+
+    @property
+    def items_per_sec(self):
+        """smoothed (EWMA)"""
+        return 1 / self.ewma_seconds if self.ewma_seconds else 0
+
+    @property
+    def instant_items_per_sec(self):
+        """rate of the last update"""
+        if not self.last_duration or self.ring_len == 0:
+            return 0
+        return self.ring[self.ring_pos - 1][1] / self.last_duration
+
+    @property
+    def window_items_per_sec(self):
+        return self.window_items / self.window_seconds if self.window_seconds > 0 else 0
+
+    @property
+    def mb_per_sec(self):
+        return self.window_bytes / self.window_seconds / 1e6 if self.window_seconds > 0 else 0
+
+    @property
+    def error_rate(self):
+        return self.window_errors / self.window_items if self.window_items else 0
+
+    @property
+    def eta_seconds(self):
+        if self.ewma_seconds is None:
+            return None
+        return max(0, self.total - self.count) * self.ewma_seconds
+
+    @property
+    def eta(self):
+        eta_seconds = self.eta_seconds
+        return None if eta_seconds is None else str(timedelta(seconds=int(eta_seconds)))
+
+    def postfix(self):
+        """
+        Short statistics for a tqdm progress bar (pbar.set_postfix).
+        """
+        postfix = {"rate": f"{self.items_per_sec:.2f}/s"}
+        if self.total_bytes:
+            postfix["MB/s"] = f"{self.mb_per_sec:.2f}"
+        postfix["err"] = f"{self.error_rate:.1%}"
+        postfix["eta"] = self.eta
+        return postfix
@@ -2,107 +2,284 @@ import time
 import sys
 import traceback
 import json
-from bs4 import BeautifulSoup
 import json
 import time
-import browser_cookie3
+import os
 
 from ._exceptions_custom import *
 from .HTML_Scraper import HTML_Scraper
+from .HTML_Scraper._rate_limiter import RateLimiter
+from .HTML_Scraper._atomic_write import atomic_write
+from .HTML_Scraper._throughput_tracker import ThroughputTracker
+from .HTML_Scraper._disk_watchdog import DiskWatchdog
+from .HTML_Scraper._response_recorder import ResponseRecorder, load_archive
+from .HTML_Scraper._adaptive_rate import AdaptiveRateController, EMPTY
+from ._background_writer import BackgroundWriter
+from ._completion_journal import CompletionJournal, JOURNAL_FILENAME
+from ._retry_scheduler import RetryScheduler, retry_delay
+from ._sharding import scrape_sharded, scrape_shard, merge_shards, shard_of, SHARD_SINKS
+from ._work_queue import WorkQueue
+from ._media_store import MediaStore
+from ._metadata_sink import JSONFileSink, JSONLSink, ColumnarSink, load_metadata
+from ._sqlite_store import SQLiteSink
+from ._storage_layout import PackStore, LAYOUTS, PACK_DIRNAME, migrate_output
 
 class TT_Scraper(HTML_Scraper):
-    def __init__(self, wait_time = 0.35, output_files_fp = "data/", browser_name = None):
-        super().__init__(wait_time, output_files_fp)
-        if browser_name:
-            self.cookies = getattr(browser_cookie3, browser_name)(domain_name=".tiktok.com")
+    def __init__(self, wait_time = 0.35, output_files_fp = "data/", browser_name = None, cookie_refresh_interval = 600, layout = "flat", packfile = False, base_url = None):
+        """
+        layout = "sharded" stores the files of every video in hash-prefixed subfolders (data/3f/a9/) instead of one flat folder.
+        packfile appends media to large pack files in data/packs/ with an index for random access (see PackStore).
+        base_url sends all requests to a local stand-in server instead (e.g. http://127.0.0.1:8000, see benchmarks/standin_server.py).
+        """
+        super().__init__(wait_time, output_files_fp, browser_name, cookie_refresh_interval, base_url)
+        if layout not in LAYOUTS:
+            raise ValueError(f"layout must be one of {LAYOUTS}, not {layout!r}")
+        self.layout = layout
+        self.layout_dirs = set()
+        self.pack_store = PackStore(os.path.join(output_files_fp, PACK_DIRNAME)) if packfile else None
+        self.writer = None
+        self.journal = None
+        # set in worker mode (scrape_from_queue)
+        self.work_queue = None
+        self.worker_id = None
+        # content-addressed store for slide audio, set by scrape_list(media_store_fp=...)
+        self.media_store = None
+        # where metadata packages are stored, replaced by scrape_list(metadata_sink=...)
+        self.metadata_sink = JSONFileSink(self)
     
     from ._scrape_video import _scrape_video
-    from ._scrape_picture import _scrape_picture
-    from ._filter_tiktok_data import _force_to_int, _prep_hashtags_and_mentions, _filter_tiktok_data
-    from ._download_data import _download_data, write_video, write_pictures, write_metadata_package, write_slide_audio
+    from ._scrape_picture import _scrape_picture, _fetch_slide_parts, _fetch_slide_part
+    from ._filter_tiktok_data import _force_to_int, _prep_hashtags_and_mentions, _filter_tiktok_data, _filter_tiktok_batch
+    from ._download_data import _download_data, _download_package, _record_stored, _store_batch, _write_file, _write_media, _stream_to_file, write_video, write_pictures, write_metadata_package, write_slide_audio
     from ._exception_handler import _exception_handler
+    from ._extract_rehydration import _request_rehydration_data
+    from ._completion_journal import compact_journal
+    from ._work_queue import scrape_from_queue
+    from ._storage_layout import _package_filepath
+    from ._scrape_list_sequential import _scrape_list_sequential
+    from ._scrape_list_concurrent import _scrape_list_concurrent, _scrape_queue_async
 
 
-    def scrape_list(self, ids : list = None, scrape_content : bool = True, batch_size : int = None, clear_console = True, total_videos=0, already_scraped_count=0, total_errors=0):
+    def scrape_list(self, ids : list = None, scrape_content : bool = True, batch_size : int = None, clear_console = True, total_videos=0, already_scraped_count=0, total_errors=0, max_in_flight : int = 1, requests_per_second : float = None, stream_content : bool = False, writer_threads : int = 0, writer_max_items : int = 100, writer_max_bytes : int = 512 * 1024 * 1024, resume : bool = True, retry_errors : bool = False, adaptive_rate : bool = False, metrics_interval : float = None, disk_reserve_bytes : int = None, on_disk_full : str = "stop", media_store_fp : str = None, metadata_sink = None, record_fp : str = None):
+        """
+        Scrapes a list of TikTok video IDs.
 
-        # initialisation        
-        self.queue_length = len(ids)
-        self.log.info(f"Length of Queue = {str(self.queue_length)}")
+        max_in_flight > 1 scrapes that many videos concurrently.
+        requests_per_second sets a global request budget (HTML pages and media),
+        which replaces the per-iteration sleep of WAIT_TIME. Concurrent scraping without it
+        is paced at 1 / WAIT_TIME requests per second.
+        stream_content writes media to disk while it is downloaded instead of
+        keeping it in memory until the batch is stored.
+        writer_threads > 0 stores every package in background threads while scraping
+        continues. The writer holds at most writer_max_items packages and
+        writer_max_bytes of content, scraping pauses while it is full.
+        Every stored package is recorded in the completion journal of the output folder.
+        With resume, IDs already in the journal are skipped, except temporary failures (R)
+        and, with retry_errors, permanent errors.
+        adaptive_rate lets an AIMD controller adjust the request rate (starting at requests_per_second
+        or 1 / WAIT_TIME), it backs off on 403s, empty pages and timeouts. Its state is in self.rate_controller.
+        metrics_interval turns on per-phase timers, every metrics_interval seconds a snapshot
+        of their histograms is appended to scrape_metrics.jsonl in the output folder.
+        disk_reserve_bytes starts a disk watchdog for the output folder. Once less space is free,
+        the queue stops after storing all pending data (on_disk_full = "stop") or pauses
+        until space is freed (on_disk_full = "pause"). self.disk_full tells if the queue stopped early.
+        media_store_fp stores the audio of slides once per sound in a content-addressed MediaStore
+        (e.g. shared by several runs) and references the blob in the metadata instead of writing slide_audio.mp3.
+        metadata_sink replaces the JSON file per video, e.g. with a JSONLSink or ColumnarSink. It is flushed
+        at the end, not closed, so it can be used for several queues.
+        record_fp archives every response (HTML pages, media and their headers) in a ResponseRecorder
+        for offline replay with benchmarks/standin_server.py.
+        """
 
-        if not batch_size:
-            batch_size = self.queue_length
+        self._open_session(max_in_flight, requests_per_second, writer_threads, writer_max_items, writer_max_bytes, adaptive_rate, metrics_interval,
+                           disk_reserve_bytes, on_disk_full, media_store_fp, metadata_sink, record_fp, total_videos, already_scraped_count, total_errors)
+        try:
+            # completion journal
+            if resume and len(self.journal) > 0:
+                n_ids = len(ids)
+                ids = [id for id in ids if not self.journal.is_done(id, retry_errors)]
+                self.log.info(f"Skipping {n_ids - len(ids):,} IDs already in the journal")
+
+            self.log.info(f"Length of Queue = {str(len(ids))}")
+            self._scrape_ids(ids, scrape_content, batch_size, max_in_flight, clear_console, stream_content)
+            self._logging_queue_progress()
+
+        finally:
+            self._close_session()
+        self.log.info("Queue ended.\n")
+
+    def _open_session(self, max_in_flight = 1, requests_per_second = None, writer_threads = 0, writer_max_items = 100, writer_max_bytes = 512 * 1024 * 1024, adaptive_rate = False, metrics_interval = None, disk_reserve_bytes = None, on_disk_full = "stop", media_store_fp = None, metadata_sink = None, record_fp = None, total_videos = 0, already_scraped_count = 0, total_errors = 0):
+        """
+        Sets up everything a queue is scraped with (journal, rate limiter, statistics, disk watchdog,
+        metadata sink, stores and background writer, see scrape_list for the arguments).
+        IDs are scraped with _scrape_ids until _close_session, e.g. several leases of a work queue.
+        """
+        # completion journal
+        self.journal = CompletionJournal(os.path.join(self.VIDEOS_OUT_FP, JOURNAL_FILENAME))
+
+        self.rate_limiter = RateLimiter(requests_per_second) if requests_per_second else None
+        if self.rate_limiter is None and (adaptive_rate or max_in_flight > 1):
+            # concurrent workers do not sleep WAIT_TIME, they share its rate instead
+            self.rate_limiter = RateLimiter(1 / max(self.WAIT_TIME, 0.01))
+        self.rate_controller = None
+        if adaptive_rate:
+            initial_rate = self.rate_limiter.rate
+            self.rate_controller = AdaptiveRateController(self.rate_limiter, min_rate=initial_rate / 10, max_rate=initial_rate * 5)
+
+        # every thread needs its own kept-alive connection per host
+        # (slides fetch up to SLIDE_CONCURRENCY parts at once)
+        if max_in_flight * self.SLIDE_CONCURRENCY > self.pool_maxsize:
+            self._mount_session_adapters(max_in_flight * self.SLIDE_CONCURRENCY)
+
+        # per-phase instrumentation
+        self.timers.enabled = metrics_interval is not None
+        if metrics_interval is not None:
+            self.metrics_fp = os.path.join(self.VIDEOS_OUT_FP, "scrape_metrics.jsonl")
+            self.metrics_interval = metrics_interval
 
         ## statistics
+        self.queue_length = 0
         self.total_videos = total_videos
         self.already_scraped_count = already_scraped_count
         self.total_errors = total_errors
-        
-        # scrape batches of data
-        batch_of_metadata = []
-        for self.iterations, id in enumerate(ids, start=1):
-                # logging
-                start = time.time()
-                self._logging_queue_progress()
-
-                # scraping
-                self.log.info(f"-> id {id}")
-                metadata_package, content_binary = self.scrape(id=id, scrape_content=scrape_content, download_metadata=False, download_content=False)
-                metadata_package["content_binary"] = content_binary
-                self.repeated_error = 0  
-
-                # save data in memory until stored
-                batch_of_metadata.append(metadata_package)
-                
-                #with open(f"test_batch.json", "w", encoding="utf-8") as f:
-                #    json.dump(batch_of_metadata, f, ensure_ascii=False, indent=4)
-                
-                # stored batch of data
-                if len(batch_of_metadata) >= batch_size:
-                    # upsert metadata and write mp4s to output dir
-                    self.log.info("\nstoring data batch...\n")
-                    self._download_data(metadata_batch = batch_of_metadata)
-                    
-                    # clean up
-                    batch_of_metadata = []
-
-                # measure time and set wait time
-                stop = time.time()
-                self.ITER_TIME = stop - start
-                wait_time_left = max(0, self.WAIT_TIME - self.ITER_TIME)
-                time.sleep(wait_time_left)
-                self.ITER_TIME = self.ITER_TIME + wait_time_left
-
-                # interrupt if too many errors in a row
-                if self.repeated_error > self.ALLOW_REPEATED_ERRORS:
-                    self.log.ERROR("Too many Errors in a row!")
-                    self.log.ERROR(traceback.format_exc())
-                    self.log.ERROR("Stopping program...")
-                    sys.exit(0)
-                
-                # end of loop
-                if clear_console:
-                    self._clear_console()
-
-        self._logging_queue_progress()
-        if batch_of_metadata:
-            self.log.info("Final output...")
-            self._download_data(metadata_batch = batch_of_metadata)
-        self.log.info("Queue ended.\n")
+        self.iterations = 0
+        self.throughput = ThroughputTracker()
+        self.last_bytes_received = self.bytes_received
+
+        # disk watchdog
+        self.disk_full = False
+        if disk_reserve_bytes is not None:
+            self.disk_watchdog = DiskWatchdog(self.VIDEOS_OUT_FP, lambda: self.bytes_written, disk_reserve_bytes, on_full=on_disk_full, log=self.log)
+
+        self.metadata_sink = metadata_sink or JSONFileSink(self)
+
+        # media store
+        if media_store_fp is not None:
+            self.media_store = MediaStore(media_store_fp)
+
+        # response archive
+        if record_fp is not None:
+            self.recorder = ResponseRecorder(record_fp)
+
+        # background writer, packages are handed over one by one
+        if writer_threads > 0:
+            self.writer = BackgroundWriter(self._download_data, n_threads=writer_threads, max_items=writer_max_items, max_bytes=writer_max_bytes)
+
+    def _scrape_ids(self, ids, scrape_content, batch_size, max_in_flight, clear_console, stream_content):
+        """
+        Scrapes ids in the open session, they are added to the queue length and ETA.
+        A batch is stored every batch_size packages (default: all of ids, with a background writer: every package).
+        """
+        self.queue_length += len(ids)
+        self.throughput.total = self.queue_length
+        if not batch_size:
+            batch_size = len(ids)
+        if self.writer is not None:
+            batch_size = 1
+
+        if max_in_flight > 1:
+            self._scrape_list_concurrent(ids, scrape_content, batch_size, max_in_flight, clear_console, stream_content)
+        else:
+            self._scrape_list_sequential(ids, scrape_content, batch_size, clear_console, stream_content)
+
+    def _flush_session(self):
+        """
+        Waits until every package scraped so far is stored and recorded in the journal.
+        """
+        if self.writer is not None:
+            self.writer.flush()
+        # packages buffered by the sink are recorded in the journal once they are written
+        self._record_stored(self.metadata_sink.flush())
+
+    def _close_session(self):
+        """
+        Stores everything that is pending and closes what _open_session set up
+        (also on Ctrl-C: everything handed to the writer is written before returning).
+        """
+        if self.writer is not None:
+            self.log.info("Flushing background writer...")
+            self.writer.close()
+            self.writer = None
+        # packages buffered by the sink are recorded in the journal once they are written
+        self._record_stored(self.metadata_sink.flush())
+        self._write_metrics_snapshot(force=True)
+        if self.disk_watchdog is not None:
+            self.disk_watchdog.close()
+            self.disk_watchdog = None
+        self.journal.close()
+        self.journal = None
+        if self.media_store is not None:
+            self.log.info(f"Media store: {self.media_store.hits:,} audio downloads skipped ({self.media_store.bytes_saved / 1e6:.1f} MB)")
+            self.media_store.close()
+            self.media_store = None
+        if self.recorder is not None:
+            self.log.info(f"Recorded {self.recorder.n_responses:,} responses in {self.recorder.archive_fp}")
+            self.recorder.close()
+            self.recorder = None
+
+    def close(self):
+        """
+        Closes the pack the scraper appends to (it stays open across scrape_list calls).
+        Call it once the scraper is no longer used.
+        """
+        if self.pack_store is not None:
+            self.pack_store.close()
 
-    def scrape(self, id, scrape_content : bool = False, download_metadata = True, download_content = True):
+    def scrape(self, id, scrape_content : bool = False, download_metadata = True, download_content = True, stream_content : bool = False, retry : bool = True):
         """
         Scrapes a single TikTok video based on its ID.
+        With stream_content, media is written to disk during the download
+        (independent of download_content) and not returned.
+        On RetryLaterError the video is retried with exponential backoff, up to
+        MAX_RETRY_ATTEMPTS times before an error package (code "R") is returned.
+        With retry=False the RetryLaterError is raised instead (used by scrape_list).
         """
         id = str(id)
+        attempt = 0
+        while True:
+            generation = self.headers_generation
+            try:
+                metadata_package, content_binary = self._scrape_attempt(id, scrape_content, stream_content)
+                break
+            except RetryLaterError:
+                attempt += 1
+                self._refresh_request_headers(generation)
+                if not retry:
+                    with self.stats_lock:
+                        self.repeated_error += 1
+                    raise
+                if attempt >= self.MAX_RETRY_ATTEMPTS:
+                    metadata_package = self._exception_handler(id, "R", "RetryLaterError")
+                    content_binary = None
+                    break
+                self.log.warning("-> retrying video due to error in package download...")
+                time.sleep(retry_delay(attempt, self.RETRY_BASE_DELAY, self.RETRY_MAX_DELAY))
+
+        # download or return data
+        if download_metadata and download_content:
+            metadata_package["content_binary"] = content_binary
+            self._download_data(metadata_batch = [metadata_package])
+        elif not download_metadata and download_content:
+            metadata_package["content_binary"] = content_binary
+            self._download_data(metadata_batch = [metadata_package], download_metadata=False)
+            return metadata_package, None
+        elif download_metadata and not download_content:
+            metadata_package["content_binary"] = content_binary
+            self._download_data(metadata_batch = [metadata_package], download_content=False)
+            return None, content_binary
+        else:
+            return metadata_package, content_binary
+
+    def _scrape_attempt(self, id, scrape_content, stream_content):
+        """
+        One attempt to scrape a video, returns the metadata package and the content binary.
+        Raises RetryLaterError, all other errors are turned into error packages.
+        """
+        content_streamed = None
         try:
             # scraping html data
-            requested_data = self.request_and_retain_cookies(f"https://www.tiktok.com/@tiktok/video/{id}")
-            soup = BeautifulSoup(requested_data.text, "html.parser")
-            tt_script = soup.find('script', attrs={'id':"__UNIVERSAL_DATA_FOR_REHYDRATION__"})
-            try:
-                requested_data_str = json.loads(tt_script.string)
-            except AttributeError:
-                raise RetryLaterError
+            # raises RetryLaterError if the page has no rehydration script
+            requested_data_str = self._request_rehydration_data(f"https://www.tiktok.com/@tiktok/video/{id}")
 
             # filtering html data
             if requested_data_str:
@@ -112,24 +289,32 @@ class TT_Scraper(HTML_Scraper):
                     raise ItemInfoError
             else:
                 self.log.info(f"https://www.tiktok.com/@tiktok/video/{id}")
+                self._report_rate_event(EMPTY)
                 raise NoDataFromURL
-            metadata_package = self._filter_tiktok_data(interesting_elements)
+            with self.timers.phase("filter"):
+                metadata_package = self._filter_tiktok_data(interesting_elements)
             video_binary = None
             slide_pictures = None
             slide_audio = None
-            filepath = f"{self.VIDEOS_OUT_FP}tiktok_{id}_*"
+            filepath = self._package_filepath(id)
             metadata_package["file_metadata"]["filepath"] = filepath
 
             # scraping content, if requested by user
             if scrape_content:
 
+                stream_filepath = filepath if stream_content else None
                 try:
-                    video_binary = self._scrape_video(metadata = requested_data_str)
+                    video_binary = self._scrape_video(metadata = requested_data_str, filepath = stream_filepath)
                     metadata_package["file_metadata"]["is_slide"] = False
+                    content_streamed = "video" if stream_content else None
                 except VideoIsPicture:
-                    slide_pictures, picture_formats, slide_audio = self._scrape_picture(metadata = requested_data_str)
+                    slide_pictures, picture_formats, slide_audio, audio_blob = self._scrape_picture(metadata = requested_data_str, filepath = stream_filepath)
                     metadata_package["file_metadata"]["is_slide"] = True
+                    content_streamed = "slide" if stream_content else None
                     metadata_package["file_metadata"]["picture_formats"] = picture_formats
+                    # reference to the audio in the media store instead of a slide_audio.mp3 per post
+                    if audio_blob is not None:
+                        metadata_package["file_metadata"]["slide_audio_sha256"], metadata_package["file_metadata"]["slide_audio_blob"] = audio_blob
 
         # handling exceptions        
         except NoDataFromURL:
@@ -159,39 +344,15 @@ class TT_Scraper(HTML_Scraper):
             content_binary = None
             video_binary = None
             slide_pictures = None
-        except RetryLaterError:
-            #retry 
-            self.repeated_error += 1
-            self.log.warning("-> retrying video due to error in package download...")
-            time.sleep(self.repeated_error * 3)
-            self._init_request_headers()
-            video_binary = None
-            slide_pictures = None
-            metadata_package, content_binary = self.scrape(id=id, scrape_content=scrape_content, download_metadata=False, download_content=False)
-            if self.repeated_error > self.ALLOW_REPEATED_ERRORS:
-                self.log.ERROR("too many errors in a row")
-                sys.quit(1)
-        
         
         # create array of binary content (videos, pictures, music) 
         if video_binary:
             content_binary = {"type": "video", "mp4_binary": video_binary}
         elif slide_pictures:
             content_binary = {"type": "slide", "slide_pictures": slide_pictures, "slide_audio": slide_audio}
+        elif content_streamed:
+            content_binary = {"type": content_streamed, "streamed": True}
         else:
             content_binary = None      
 
-        # download or return data
-        if download_metadata and download_content:
-            metadata_package["content_binary"] = content_binary
-            self._download_data(metadata_batch = [metadata_package])
-        elif not download_metadata and download_content:
-            metadata_package["content_binary"] = content_binary
-            self._download_data(metadata_batch = [metadata_package], download_metadata=False)
-            return metadata_package, None
-        elif download_metadata and not download_content:
-            metadata_package["content_binary"] = content_binary
-            self._download_data(metadata_batch = [metadata_package], download_content=False)
-            return None, content_binary
-        else:
-            return metadata_package, content_binary
+        return metadata_package, content_binary
@@ -0,0 +1,101 @@
+import threading
+from collections import deque
+
+class BackgroundWriter:
+    """
+    Writes metadata packages (and their content) in background threads.
+    The queue is bounded by number of items and by bytes of content in flight,
+    submit() blocks while it is full, so scraping pauses when writing falls behind.
+    """
+    def __init__(self, write_batch, n_threads = 1, max_items = 100, max_bytes = 512 * 1024 * 1024):
+        self.write_batch = write_batch
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+
+        self.queue = deque()
+        self.items_in_flight = 0
+        self.bytes_in_flight = 0
+        self.error = None
+        self.closed = False
+        self.condition = threading.Condition()
+
+        self.threads = [threading.Thread(target=self._run, name=f"writer-{i}", daemon=True) for i in range(n_threads)]
+        for thread in self.threads:
+            thread.start()
+
+    @staticmethod
+    def package_size(metadata_package):
+        content_binary = metadata_package.get("content_binary")
+        if not content_binary or content_binary.get("streamed"):
+            return 0
+        if content_binary["type"] == "video":
+            return len(content_binary["mp4_binary"] or b"")
+        size = sum(len(picture or b"") for picture in content_binary["slide_pictures"])
+        return size + len(content_binary["slide_audio"] or b"")
+
+    def submit(self, metadata_package):
+        """
+        Queues a package for writing, blocks while the writer is full.
+        A single package larger than max_bytes is accepted once the queue is empty.
+        """
+        size = self.package_size(metadata_package)
+        with self.condition:
+            while (self.items_in_flight > 0 and self.error is None
+                   and (self.items_in_flight >= self.max_items or self.bytes_in_flight + size > self.max_bytes)):
+                self.condition.wait()
+            self._raise_error()
+            if self.closed:
+                raise RuntimeError("BackgroundWriter is closed")
+            self.queue.append((metadata_package, size))
+            self.items_in_flight += 1
+            self.bytes_in_flight += size
+            self.condition.notify_all()
+
+    def flush(self):
+        """
+        Blocks until every submitted package has been written.
+        Re-raises the first error of a writer thread.
+        """
+        with self.condition:
+            while self.items_in_flight > 0 and self.error is None:
+                self.condition.wait()
+            self._raise_error()
+
+    def close(self):
+        """
+        Flushes pending packages and stops the writer threads.
+        """
+        try:
+            self.flush()
+        finally:
+            with self.condition:
+                self.closed = True
+                self.condition.notify_all()
+            for thread in self.threads:
+                thread.join()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.closed:
+                    self.condition.wait()
+                if not self.queue:
+                    return None
+                metadata_package, size = self.queue.popleft()
+
+            try:
+                self.write_batch([metadata_package])
+            except BaseException as e:
+                with self.condition:
+                    if self.error is None:
+                        self.error = e
+
+            with self.condition:
+                self.items_in_flight -= 1
+                self.bytes_in_flight -= size
+                self.condition.notify_all()
@@ -0,0 +1,108 @@
+import os
+import threading
+from datetime import datetime, timezone
+
+from .HTML_Scraper._atomic_write import atomic_write
+
+JOURNAL_FILENAME = "scrape_journal.tsv"
+SUCCESS = "success"
+# retries were used up (RetryLaterError), worth another try in a later run; the other error codes are permanent
+TEMPORARY_ERRORS = ("R",)
+
+def read_journal(path):
+    """
+    Reads a journal without opening it for writing, e.g. while a scraper is still appending to it.
+    Returns {id: (outcome, timestamp)} and whether the last line was truncated.
+    """
+    outcomes = {}
+    truncated = False
+    if not os.path.exists(path):
+        return outcomes, truncated
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            # a crash can leave a truncated last line
+            if not line.endswith("\n"):
+                truncated = True
+                continue
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) != 3:
+                continue
+            id, outcome, timestamp = fields
+            outcomes[id] = (outcome, timestamp)
+    return outcomes, truncated
+
+class CompletionJournal:
+    """
+    Append-only journal of finished IDs, one line per stored package:
+        <id>\\t<outcome>\\t<timestamp>
+    outcome is "success" or the error code of the package (D, I, V, O, R).
+    The last line of an ID wins. All entries are held in a dict for O(1) lookups.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.outcomes = {}
+        self.truncated = False
+        self._load()
+        self.file = open(self.path, "a", encoding="utf-8")
+        if self.truncated:
+            self.file.write("\n")
+
+    def _load(self):
+        self.outcomes, self.truncated = read_journal(self.path)
+
+    def __len__(self):
+        return len(self.outcomes)
+
+    def __contains__(self, id):
+        return str(id) in self.outcomes
+
+    def outcome(self, id):
+        entry = self.outcomes.get(str(id))
+        return entry[0] if entry else None
+
+    def is_done(self, id, retry_errors = False):
+        """
+        Successes are done, permanent errors unless retry_errors.
+        Temporary failures (TEMPORARY_ERRORS) are never done.
+        """
+        outcome = self.outcome(id)
+        if outcome is None or outcome in TEMPORARY_ERRORS:
+            return False
+        return outcome == SUCCESS or not retry_errors
+
+    def record(self, id, outcome, timestamp = None):
+        id = str(id)
+        if timestamp is None:
+            timestamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self.lock:
+            self.file.write(f"{id}\t{outcome}\t{timestamp}\n")
+            self.file.flush()
+            self.outcomes[id] = (outcome, timestamp)
+
+    def compact(self):
+        """
+        Rewrites the journal with only the last entry of every ID.
+        """
+        with self.lock:
+            self.file.close()
+            with atomic_write(self.path, "w", encoding="utf-8") as f:
+                for id, (outcome, timestamp) in self.outcomes.items():
+                    f.write(f"{id}\t{outcome}\t{timestamp}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+def compact_journal(self):
+    """
+    Compacts the completion journal in the output folder.
+    """
+    journal = self.journal or CompletionJournal(os.path.join(self.VIDEOS_OUT_FP, JOURNAL_FILENAME))
+    journal.compact()
+    self.log.info(f"Journal compacted to {len(journal):,} entries")
+    if journal is not self.journal:
+        journal.close()
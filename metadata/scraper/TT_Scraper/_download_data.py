@@ -1,51 +1,123 @@
 import json
+import os
+
+from ._background_writer import BackgroundWriter
+from .HTML_Scraper._atomic_write import atomic_write
+
+STREAM_CHUNK_SIZE = 1024 * 1024
 
 def _download_data(self, metadata_batch, download_metadata = True, download_content = True):
     for metadata_package in metadata_batch:
-        content_binary = metadata_package.pop("content_binary")
-
-        # in case a video or slides where scraped:
-        if content_binary and download_content:
-            
-            # pictures / slides
-            if content_binary["type"] == "slide":
-                self.write_pictures(content_binary["slide_pictures"], metadata_package["file_metadata"]["filepath"])
-                self.write_slide_audio(content_binary["slide_audio"], metadata_package["file_metadata"]["filepath"])
-            
-            # videos
-            elif content_binary["type"] == "video":
-                self.write_video(content_binary["mp4_binary"], metadata_package["file_metadata"]["filepath"])
-
-        # save metadata
-        if download_metadata:
-            self.write_metadata_package(metadata_package["file_metadata"]["filepath"], metadata_package)
-        else:
-            return metadata_package
+        with self.timers.phase("disk_write") as phase:
+            result = self._download_package(metadata_package, download_metadata, download_content, phase)
+        if not download_metadata:
+            return result
     
     return None
 
+def _download_package(self, metadata_package, download_metadata, download_content, phase):
+    content_binary = metadata_package.pop("content_binary")
+
+    # in case a video or slides where scraped (streamed content is already on disk):
+    if content_binary and download_content and not content_binary.get("streamed"):
+        phase.add_bytes(BackgroundWriter.package_size({"content_binary": content_binary}))
+        
+        # pictures / slides
+        if content_binary["type"] == "slide":
+            self.write_pictures(content_binary["slide_pictures"], metadata_package["file_metadata"]["filepath"])
+            if content_binary["slide_audio"] is not None:
+                self.write_slide_audio(content_binary["slide_audio"], metadata_package["file_metadata"]["filepath"])
+        
+        # videos
+        elif content_binary["type"] == "video":
+            self.write_video(content_binary["mp4_binary"], metadata_package["file_metadata"]["filepath"])
+
+    # save metadata
+    if download_metadata:
+        self._record_stored(self.metadata_sink.write(metadata_package))
+    else:
+        return metadata_package
+    return None
+
+def _record_stored(self, stored):
+    """
+    Records (id, outcome) of packages the metadata sink reported as stored
+    in the journal and the work queue.
+    """
+    for id, outcome in stored:
+        if self.journal is not None:
+            self.journal.record(id, outcome)
+        if self.work_queue is not None:
+            self.work_queue.ack(self.worker_id, id, outcome)
+
+def _store_batch(self, metadata_batch):
+    """
+    Stores a batch of scraped packages, either directly
+    or by handing them to the background writer (blocks while it is full).
+    """
+    if self.writer is None:
+        self._download_data(metadata_batch = metadata_batch)
+        return None
+    for metadata_package in metadata_batch:
+        self.writer.submit(metadata_package)
+
+def _write_file(self, filename, content):
+    """
+    Writes content (bytes) with atomic_write.
+    """
+    with atomic_write(filename) as f:
+        f.write(content)
+    self._count_written_bytes(len(content))
+
+def _write_media(self, filename, content):
+    """
+    Writes a media file, or appends it to the pack store under its file name.
+    """
+    if self.pack_store is not None:
+        self._count_written_bytes(self.pack_store.append(os.path.basename(filename), content))
+    else:
+        self._write_file(filename, content)
+
 def write_metadata_package(self, filepath, metadata_package):
     filename = filepath.replace("*", "metadata.json")
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(metadata_package, f, ensure_ascii=False, indent=4)
+    self._write_file(filename, json.dumps(metadata_package, ensure_ascii=False, indent=4).encode("utf-8"))
     self.log.info(f"--> JSON saved to {filename}")
 
 def write_video(self, video_content, filepath):
     filename = filepath.replace("*", "video.mp4")
-    with open(filename, 'wb') as fn:
-        fn.write(video_content)
+    self._write_media(filename, video_content)
     self.log.info(f"--> MP4  saved to {filename}")
     return None
 
 def write_pictures(self, slide_pictures, filepath):
     for i, picture in enumerate(slide_pictures):
         filename = filepath.replace("*", f"slide{str(i)}.jpeg")
-        with open(filename, 'wb') as f:
-            f.write(picture)
+        self._write_media(filename, picture)
         self.log.info(f"--> JPEG saved to {filename}")
 
 def write_slide_audio(self, slide_audio, filepath):
     filename = filepath.replace("*", "slide_audio.mp3")
-    with open(filename, "wb") as f:
-        f.write(slide_audio)
+    self._write_media(filename, slide_audio)
     self.log.info(f"--> MP3 saved to {filename}")
+
+def _stream_to_file(self, response, filename):
+    """
+    Writes the body of a streamed response to disk in chunks (with atomic_write,
+    an interrupted download leaves no file).
+    Returns the number of bytes written.
+    """
+    nbytes = 0
+    try:
+        with atomic_write(filename) as f:
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                f.write(chunk)
+                nbytes += len(chunk)
+    finally:
+        response.close()
+    if self.pack_store is not None:
+        # complete downloads go to the pack, partial ones never do
+        self.pack_store.append_file(os.path.basename(filename), filename)
+        os.remove(filename)
+    self._count_written_bytes(nbytes)
+    self.log.info(f"--> streamed to {filename}")
+    return nbytes
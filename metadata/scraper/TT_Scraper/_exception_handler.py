@@ -1,8 +1,9 @@
 import traceback
 
 def _exception_handler(self, video_id, error_code, exception_name):
-    self.repeated_error += 1
-    self.total_errors += 1
+    with self.stats_lock:
+        self.repeated_error += 1
+        self.total_errors += 1
 
     self.log.warning(f"Handling Error: {exception_name}")
 
@@ -1,3 +1,6 @@
+# exit status of a scraper stopped by too many errors in a row
+TOO_MANY_ERRORS_EXIT_CODE = 3
+
 ## ERROR Classes
 class NoDataFromURL(Exception):
     '''URL could not provide data'''
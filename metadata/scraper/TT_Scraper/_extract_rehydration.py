@@ -0,0 +1,120 @@
+import json
+
+from ._exceptions_custom import *
+from .HTML_Scraper._adaptive_rate import EMPTY
+
+REHYDRATION_SCRIPT_ID = b"__UNIVERSAL_DATA_FOR_REHYDRATION__"
+SCRIPT_END_TAG = b"</script>"
+CHUNK_SIZE = 64 * 1024
+# bytes after the script that are still read, so the connection can go back to the pool
+DRAIN_LIMIT = 256 * 1024
+
+class RehydrationExtractor:
+    """
+    Finds the __UNIVERSAL_DATA_FOR_REHYDRATION__ script of a TikTok page
+    without building a HTML tree. Chunks of the page are fed one by one,
+    feed() returns True as soon as the closing tag of the script arrived.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+        self.scan_from = 0
+        self.content_start = None
+        self.content_end = None
+
+    def feed(self, chunk):
+        if self.content_end is not None:
+            return True
+        self.buffer += chunk
+
+        # search for the opening tag <script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" ...>
+        if self.content_start is None:
+            pos = self.buffer.find(REHYDRATION_SCRIPT_ID, self.scan_from)
+            while pos != -1 and self.buffer[pos-4:pos] not in (b'id="', b"id='"):
+                pos = self.buffer.find(REHYDRATION_SCRIPT_ID, pos + 1)
+            if pos == -1:
+                # drop what has been scanned, the id may be split between two chunks
+                keep = len(REHYDRATION_SCRIPT_ID) + 4
+                if len(self.buffer) > keep:
+                    del self.buffer[:-keep]
+                self.scan_from = 0
+                return False
+            tag_end = self.buffer.find(b">", pos)
+            if tag_end == -1:
+                # opening tag is not complete yet
+                del self.buffer[:pos - 4]
+                self.scan_from = 0
+                return False
+            del self.buffer[:tag_end + 1]
+            self.content_start = 0
+            self.scan_from = 0
+
+        # search for the closing tag
+        pos = self.buffer.find(SCRIPT_END_TAG, self.scan_from)
+        if pos == -1:
+            self.scan_from = max(0, len(self.buffer) - len(SCRIPT_END_TAG) + 1)
+            return False
+        self.content_end = pos
+        return True
+
+    def result(self):
+        """
+        Returns the parsed JSON of the script.
+        Raises RetryLaterError if the page contains no (complete) rehydration script.
+        """
+        if self.content_end is None:
+            raise RetryLaterError
+        script = bytes(self.buffer[self.content_start:self.content_end]).strip()
+        if not script:
+            raise RetryLaterError
+        try:
+            return json.loads(script.decode("utf-8"))
+        except ValueError:
+            raise RetryLaterError
+
+def extract_rehydration_data(chunks):
+    """
+    Feeds an iterable of byte chunks into a RehydrationExtractor
+    and stops consuming it once the script is complete.
+    """
+    extractor = RehydrationExtractor()
+    for chunk in chunks:
+        if extractor.feed(chunk):
+            break
+    return extractor.result()
+
+def _request_rehydration_data(self, url):
+    """
+    Streams the HTML page under url and returns its rehydration JSON.
+    """
+    extractor = RehydrationExtractor()
+    with self.timers.phase("html_fetch") as phase:
+        response = self.request_and_retain_cookies(url, stream=True)
+        try:
+            chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+            nbytes = 0
+            for chunk in chunks:
+                nbytes += len(chunk)
+                if extractor.feed(chunk):
+                    break
+            phase.add_bytes(nbytes)
+            self._count_received_bytes(nbytes)
+        except BaseException:
+            response.close()
+            raise
+    try:
+        with self.timers.phase("html_parse"):
+            try:
+                requested_data_str = extractor.result()
+            except RetryLaterError:
+                self._report_rate_event(EMPTY)
+                raise
+
+        # read a short rest of the page to keep the connection alive, otherwise close it
+        drained = 0
+        for chunk in chunks:
+            drained += len(chunk)
+            if drained > DRAIN_LIMIT:
+                break
+    finally:
+        response.close()
+    return requested_data_str
@@ -18,6 +18,13 @@ def _prep_hashtags_and_mentions(self, data_slot):
     hashtags_metadata = []
     mentions_list = []
     if text_elements is not None:
+        # challenge descriptions by ID, built once per video (the first challenge of an ID wins)
+        challenge_descriptions = {}
+        for challenge in challenges or []:
+            challenge_id = self._force_to_int(challenge.get("id", None))
+            if challenge_id not in challenge_descriptions:
+                challenge_descriptions[challenge_id] = challenge.get("desc", None)
+
         for element in text_elements:
             mention = element.get("userId", None)
             if mention == None:
@@ -28,13 +35,7 @@ def _prep_hashtags_and_mentions(self, data_slot):
                 hashtag_data["type"] = element.get("type", None)
                 hashtag_data["sub_type"] = element.get("subType", None)
                 hashtag_data["is_commerce"] = element.get("isCommerce", None)
-
-                matching_callenge = list(filter(lambda x : self._force_to_int(x["id"]) == hashtag_data["id"], challenges))
-                if matching_callenge:
-                    matching_callenge = matching_callenge[0]
-                    hashtag_data["description"] = matching_callenge["desc"]
-                else:
-                    hashtag_data["description"] = None
+                hashtag_data["description"] = challenge_descriptions.get(hashtag_data["id"], None)
 
                 hashtags_metadata.append(hashtag_data)
             else:
@@ -43,17 +44,30 @@ def _prep_hashtags_and_mentions(self, data_slot):
             
     return hashtags_metadata, mentions_list
 
+def _sub_dict(data, key):
+    # missing or null sub-dicts are treated as empty
+    value = data.get(key, None)
+    return value if isinstance(value, dict) else {}
+
 def _filter_tiktok_data(self, data_slot):
     hashtags_metadata, mentions_list = self._prep_hashtags_and_mentions(data_slot)
 
+    # sub-dicts, looked up once
+    author_data = _sub_dict(data_slot, "author")
+    music_data = _sub_dict(data_slot, "music")
+    video_data = _sub_dict(data_slot, "video")
+    volume_data = _sub_dict(video_data, "volumeInfo")
+    cla_data = _sub_dict(video_data, "claInfo")
+
     # video metadata
     video_metadata = {}
     ## id --> bigint NOT NULL
     video_metadata["id"] = self._force_to_int(data_slot.get("id", None)) #ID of the specific video
     ## time_created --> timestamp without time zone,
-    video_metadata["time_created"] = datetime.fromtimestamp(int(data_slot.get("createTime", None))).isoformat()
+    create_time = self._force_to_int(data_slot.get("createTime", None))
+    video_metadata["time_created"] = datetime.fromtimestamp(create_time).isoformat() if create_time is not None else None
     ## author_id --> bigint
-    video_metadata["author_id"] = self._force_to_int(data_slot.get("author", {}).get("id", None))
+    video_metadata["author_id"] = self._force_to_int(author_data.get("id", None))
     ## description --> text
     video_metadata["description"] = data_slot.get("desc", None)
     ## hashtags --> character varying(250)[]
@@ -64,7 +78,7 @@ def _filter_tiktok_data(self, data_slot):
     else:
         video_metadata["mentions"] = None
     ## music_id --> bigint
-    video_metadata["music_id"] = self._force_to_int(data_slot.get("music", {}).get("id", None))
+    video_metadata["music_id"] = self._force_to_int(music_data.get("id", None))
     ## schedule_time --> integer
     video_metadata["schedule_time"] = data_slot.get("scheduleTime", None)
     ## location_created --> character varying(2)
@@ -83,10 +97,7 @@ def _filter_tiktok_data(self, data_slot):
         video_metadata["suggested_words"] = None
 
     ## statistics for video metadata
-    try:
-        stats_data = data_slot["statsV2"]
-    except KeyError:
-        stats_data = data_slot.get("stats", {})
+    stats_data = _sub_dict(data_slot, "statsV2" if "statsV2" in data_slot else "stats")
 
     ## diggcount --> integer
     video_metadata["diggcount"] = self._force_to_int(stats_data.get("diggCount", None))
@@ -131,7 +142,7 @@ def _filter_tiktok_data(self, data_slot):
     video_metadata["take_down"] = data_slot.get("takeDown", None)
     ## effect_stickers --> character varying(250)[]
     video_metadata["effect_stickers"] = data_slot.get("effectStickers", None)
-    if len(video_metadata["effect_stickers"]) == 0:
+    if video_metadata["effect_stickers"] is not None and len(video_metadata["effect_stickers"]) == 0:
         video_metadata["effect_stickers"] = None
     ## private_item --> boolean
     video_metadata["private_item"] = data_slot.get("privateItem", None)
@@ -141,13 +152,13 @@ def _filter_tiktok_data(self, data_slot):
     video_metadata["stitch_enabled"] = data_slot.get("stitchEnabled", False) # Not in metadata seems to mean FALSE
     ## stickers_on_item --> character varying(250)[]
     video_metadata["stickers_on_item"] = data_slot.get("stickersOnItem", None)
-    if len(video_metadata["stickers_on_item"]) == 0:
+    if video_metadata["stickers_on_item"] is not None and len(video_metadata["stickers_on_item"]) == 0:
         video_metadata["stickers_on_item"] = None
     ## share_enabled --> boolean
     video_metadata["share_enabled"] = data_slot.get("shareEnabled", None)
     ## comments --> character varying(250)[]
     video_metadata["comments"] = data_slot.get("comments", None)
-    if len(video_metadata["comments"]) == 0:
+    if video_metadata["comments"] is not None and len(video_metadata["comments"]) == 0:
         video_metadata["comments"] = None
     ## duet_display --> integer
     video_metadata["duet_display"] = data_slot.get("duetDisplay", None)
@@ -183,27 +194,27 @@ def _filter_tiktok_data(self, data_slot):
     ## filepath --> path NOT NULL
     file_metadata["filepath"] = None #specified later
     ## duration --> integer
-    file_metadata["duration"] = data_slot.get("video", {}).get("duration", None)
+    file_metadata["duration"] = video_data.get("duration", None)
     ## height --> integer
-    file_metadata["height"] = data_slot.get("video", {}).get("height", None)
+    file_metadata["height"] = video_data.get("height", None)
     ## width --> integer
-    file_metadata["width"] = data_slot.get("video", {}).get("width", None) 
+    file_metadata["width"] = video_data.get("width", None) 
     ## ratio --> integer
-    file_metadata["ratio"] = data_slot.get("video", {}).get("ratio", None) #in p
+    file_metadata["ratio"] = video_data.get("ratio", None) #in p
     if file_metadata["ratio"]:
         file_metadata["ratio"] = self._force_to_int(file_metadata["ratio"][:-1]) # 540p -> 540
     else:
         file_metadata["ratio"] = None
     ## volume_loudness --> numeric(3, 1)
-    file_metadata["volume_loudness"] = data_slot.get("video", {}).get("volumeInfo", {}).get("Loudness", None)
+    file_metadata["volume_loudness"] = volume_data.get("Loudness", None)
     ## volume_peak --> numeric(6, 5)
-    file_metadata["volume_peak"] = data_slot.get("video", {}).get("volumeInfo", {}).get("Peak", None)
+    file_metadata["volume_peak"] = volume_data.get("Peak", None)
     ## has_original_audio --> boolean
-    file_metadata["has_original_audio"] = data_slot.get("video", {}).get("claInfo", {}).get("hasOriginalAudio", None)
+    file_metadata["has_original_audio"] = cla_data.get("hasOriginalAudio", None)
     ## enable_audio_caption --> boolean
-    file_metadata["enable_audio_caption"] = data_slot.get("video", {}).get("claInfo", {}).get("enableAutoCaption", None)
+    file_metadata["enable_audio_caption"] = cla_data.get("enableAutoCaption", None)
     ## no_caption_reason --> smallint
-    file_metadata["no_caption_reason"] = data_slot.get("video", {}).get("claInfo", {}).get("noCaptionReason", None)
+    file_metadata["no_caption_reason"] = cla_data.get("noCaptionReason", None)
 
     # ---
 
@@ -212,65 +223,65 @@ def _filter_tiktok_data(self, data_slot):
     ## id --> bigint
     music_metadata["id"] = video_metadata["music_id"] # ID of the music, not the video!
     ## title --> character varying(250)
-    music_metadata["title"] = data_slot.get("music", {}).get("title", None)
+    music_metadata["title"] = music_data.get("title", None)
     if music_metadata["title"]:
         if len(music_metadata["title"]) > 250:
             music_metadata["title"] = music_metadata["title"][:250]
     ## author_name --> character varying(250)
-    music_metadata["author_name"] = data_slot.get("music", {}).get("authorName", None)
+    music_metadata["author_name"] = music_data.get("authorName", None)
     if music_metadata["author_name"]:
         if len(music_metadata["author_name"]) > 250:
             music_metadata["author_name"] = music_metadata["author_name"][:250]
 
     ## original --> boolean
-    music_metadata["original"] = data_slot.get("music", {}).get("original", None)
+    music_metadata["original"] = music_data.get("original", None)
     ## schedule_search_time --> integer
-    music_metadata["schedule_search_time"] = data_slot.get("music", {}).get("scheduleSearchTime", None)
+    music_metadata["schedule_search_time"] = music_data.get("scheduleSearchTime", None)
     ## collected --> boolean
-    music_metadata["collected"] = data_slot.get("music", {}).get("collected", None)
+    music_metadata["collected"] = music_data.get("collected", None)
     ## precise_duration --> json
-    music_metadata["precise_duration"] = data_slot.get("music", {}).get("preciseDuration", None)
+    music_metadata["precise_duration"] = music_data.get("preciseDuration", None)
 
     # ---
 
     # Author metadata
     author_metadata = {}
     ## id --> bigint
-    author_metadata["id"] = self._force_to_int(data_slot.get("author", {}).get("id", None))
+    author_metadata["id"] = self._force_to_int(author_data.get("id", None))
     ## username --> character varying(250)
-    author_metadata["username"] = data_slot.get("author", {}).get("uniqueId", None)
+    author_metadata["username"] = author_data.get("uniqueId", None)
     ## name --> character varying(250)
-    author_metadata["name"] = data_slot.get("author", {}).get("nickname", None)
+    author_metadata["name"] = author_data.get("nickname", None)
     ## signature --> text
-    author_metadata["signature"] = data_slot.get("author", {}).get("signature", None)
+    author_metadata["signature"] = author_data.get("signature", None)
     ## create_time --> integer
-    author_metadata["create_time"] = data_slot.get("author", {}).get("createTime", None)
+    author_metadata["create_time"] = author_data.get("createTime", None)
     ## verified --> boolean
-    author_metadata["verified"] = data_slot.get("author", {}).get("verified", None)
+    author_metadata["verified"] = author_data.get("verified", None)
     ## ftc --> boolean
-    author_metadata["ftc"] = data_slot.get("author", {}).get("ftc", None)
+    author_metadata["ftc"] = author_data.get("ftc", None)
     ## relation --> integer
-    author_metadata["relation"] = data_slot.get("author", {}).get("relation", None)
+    author_metadata["relation"] = author_data.get("relation", None)
     ## open_favorite --> boolean
-    author_metadata["open_favorite"] = data_slot.get("author", {}).get("openFavorite", None)
+    author_metadata["open_favorite"] = author_data.get("openFavorite", None)
     ## comment_setting --> integer
-    author_metadata["comment_setting"] = data_slot.get("author", {}).get("commentSetting", None)
+    author_metadata["comment_setting"] = author_data.get("commentSetting", None)
     ## duet_setting --> smallint
-    author_metadata["duet_setting"] = data_slot.get("author", {}).get("duetSetting", None)
+    author_metadata["duet_setting"] = author_data.get("duetSetting", None)
     ## stitch_setting --> smallint
-    author_metadata["stitch_setting"] = data_slot.get("author", {}).get("stitchSetting", None)
+    author_metadata["stitch_setting"] = author_data.get("stitchSetting", None)
     ## private_account --> boolean
-    author_metadata["private_account"] = data_slot.get("author", {}).get("privateAccount", None)
+    author_metadata["private_account"] = author_data.get("privateAccount", None)
     ## secret --> boolean
-    author_metadata["secret"] = data_slot.get("author", {}).get("secret", None)
+    author_metadata["secret"] = author_data.get("secret", None)
     ## is_ad_virtual --> boolean
-    author_metadata["is_ad_virtual"] = data_slot.get("author", {}).get("isADVirtual", None)
+    author_metadata["is_ad_virtual"] = author_data.get("isADVirtual", None)
     ## download_setting --> smallint
-    author_metadata["download_setting"] = data_slot.get("author", {}).get("downloadSetting", None)
+    author_metadata["download_setting"] = author_data.get("downloadSetting", None)
     ## recommend_reason --> character varying(250)
-    author_metadata["recommend_reason"] = data_slot.get("author", {}).get("recommendReason", None)
+    author_metadata["recommend_reason"] = author_data.get("recommendReason", None)
     ## suggest_account_bind --> boolean
-    author_metadata["suggest_account_bind"] = data_slot.get("author", {}).get("suggestAccountBind", None)
+    author_metadata["suggest_account_bind"] = author_data.get("suggestAccountBind", None)
 
     # ---x
 
@@ -283,3 +294,19 @@ def _filter_tiktok_data(self, data_slot):
     filtered_metadata["hashtags_metadata"]= hashtags_metadata
 
     return filtered_metadata
+
+def _filter_tiktok_batch(self, data_slots):
+    """
+    Maps a list of itemStructs straight into columns: {section: {field: [values]}},
+    the hashtags of every item are in "hashtags_metadata".
+    Fields left out of an item (poi_*) are None in its row.
+    """
+    rows = [self._filter_tiktok_data(data_slot) for data_slot in data_slots]
+    columns = {}
+    for section in ("video_metadata", "file_metadata", "music_metadata", "author_metadata"):
+        section_rows = [row[section] for row in rows]
+        # fields in the order they are first seen, optional ones may be missing in earlier rows
+        fields = dict.fromkeys(field for section_row in section_rows for field in section_row)
+        columns[section] = {field: [section_row.get(field) for section_row in section_rows] for field in fields}
+    columns["hashtags_metadata"] = [row["hashtags_metadata"] for row in rows]
+    return columns
@@ -0,0 +1,81 @@
+import hashlib
+import os
+import threading
+
+from .HTML_Scraper._atomic_write import atomic_write
+
+INDEX_FILENAME = "music_index.tsv"
+
+class MediaStore:
+    """
+    Content-addressed store for media shared by many posts (e.g. the audio of slides).
+    Every blob is stored once under blobs/<sha256[:2]>/<sha256>.<ext>, an append-only index
+        <music_id>\\t<sha256>\\t<ext>
+    maps music IDs to their blob, so known sounds do not have to be downloaded again.
+    Blobs are written to a temporary file and renamed, so several processes can share a store.
+    """
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self.index_path = os.path.join(root, INDEX_FILENAME)
+        self.lock = threading.Lock()
+        self.music = {}
+        self.hits = 0
+        self.bytes_saved = 0
+        self._load()
+        self.index_file = open(self.index_path, "a", encoding="utf-8")
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return None
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if not line.endswith("\n") or len(fields) != 3:
+                    continue
+                music_id, sha256, ext = fields
+                self.music[music_id] = (sha256, ext)
+
+    def blob_path(self, sha256, ext):
+        return os.path.join(self.root, "blobs", sha256[:2], f"{sha256}.{ext}")
+
+    def lookup(self, music_id):
+        """
+        Returns (sha256, path) of the blob stored for music_id, None if there is none.
+        """
+        if not music_id:
+            return None
+        entry = self.music.get(str(music_id))
+        if entry is None:
+            return None
+        sha256, ext = entry
+        path = self.blob_path(sha256, ext)
+        if not os.path.exists(path):
+            return None
+        with self.lock:
+            self.hits += 1
+            self.bytes_saved += os.path.getsize(path)
+        return sha256, path
+
+    def put(self, content, ext, music_id = None):
+        """
+        Stores content (bytes) unless a blob with the same hash exists and records it for music_id.
+        Returns (sha256, path).
+        """
+        sha256 = hashlib.sha256(content).hexdigest()
+        path = self.blob_path(sha256, ext)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with atomic_write(path) as f:
+                f.write(content)
+        if music_id:
+            with self.lock:
+                if self.music.get(str(music_id)) != (sha256, ext):
+                    self.music[str(music_id)] = (sha256, ext)
+                    self.index_file.write(f"{music_id}\t{sha256}\t{ext}\n")
+                    self.index_file.flush()
+        return sha256, path
+
+    def close(self):
+        with self.lock:
+            self.index_file.close()
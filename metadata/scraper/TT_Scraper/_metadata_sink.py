@@ -0,0 +1,261 @@
+import glob
+import gzip
+import json
+import os
+import pickle
+import threading
+
+from .HTML_Scraper._atomic_write import atomic_write
+
+# tables of the columnar sink, one per section of _filter_tiktok_data
+TABLES = ("videos", "files", "music", "authors", "hashtags")
+
+def package_outcome(metadata_package):
+    return metadata_package["video_metadata"]["id"], metadata_package.get("error_code", "success")
+
+class JSONFileSink:
+    """
+    One indented JSON file per video (tiktok_<id>_metadata.json), the default.
+    """
+    def __init__(self, scraper):
+        self.scraper = scraper
+
+    def write(self, metadata_package):
+        """
+        Stores a package, returns the (id, outcome) of all packages that are durably stored now.
+        """
+        if "file_metadata" in metadata_package:
+            filepath = metadata_package["file_metadata"]["filepath"]
+        else:
+            # error packages carry no file_metadata
+            filepath = self.scraper._package_filepath(metadata_package["video_metadata"]["id"])
+        self.scraper.write_metadata_package(filepath, metadata_package)
+        return [package_outcome(metadata_package)]
+
+    def flush(self):
+        return []
+
+    def close(self):
+        return []
+
+class JSONLSink:
+    """
+    Appends one compact JSON line per video to metadata-<n>.jsonl (or .jsonl.gz with compression="gzip").
+    A new file is started after rotate_items packages or rotate_bytes (uncompressed) bytes
+    and by every new sink, existing files are never appended to.
+    Lines are flushed every flush_items packages or flush_bytes bytes (a flush of a gzip file ends a
+    compressed block, so flushing every line would bloat it), on rotation and by flush() and close().
+    IDs are only reported as stored once their line is flushed.
+    """
+    def __init__(self, directory, compression = None, rotate_items = 100_000, rotate_bytes = None, prefix = "metadata", flush_items = 1000, flush_bytes = 4 * 1024**2):
+        if compression not in (None, "gzip"):
+            raise ValueError(f"compression must be None or 'gzip', not {compression!r}")
+        self.directory = directory
+        self.compression = compression
+        self.rotate_items = rotate_items
+        self.rotate_bytes = rotate_bytes
+        self.prefix = prefix
+        self.flush_items = flush_items
+        self.flush_bytes = flush_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.file = None
+        self.pending = []
+        self.pending_bytes = 0
+        self.file_index = len(glob.glob(os.path.join(directory, f"{prefix}-*.jsonl*")))
+
+    def _open_next(self):
+        if self.file is not None:
+            self.file.close()
+        while True:
+            self.file_index += 1
+            self.path = os.path.join(self.directory, f"{self.prefix}-{self.file_index:06d}.jsonl" + (".gz" if self.compression else ""))
+            if not os.path.exists(self.path):
+                break
+        if self.compression == "gzip":
+            self.file = gzip.open(self.path, "wb", compresslevel=6)
+        else:
+            self.file = open(self.path, "wb")
+        self.items = 0
+        self.bytes = 0
+
+    def write(self, metadata_package):
+        line = (json.dumps(metadata_package, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with self.lock:
+            stored = []
+            if (self.file is None or self.items >= self.rotate_items
+                    or (self.rotate_bytes is not None and self.bytes >= self.rotate_bytes)):
+                # closing the full file flushes it
+                stored = self._take_pending()
+                self._open_next()
+            self.file.write(line)
+            self.items += 1
+            self.bytes += len(line)
+            self.pending.append(package_outcome(metadata_package))
+            self.pending_bytes += len(line)
+            if len(self.pending) >= self.flush_items or self.pending_bytes >= self.flush_bytes:
+                self.file.flush()
+                stored.extend(self._take_pending())
+        return stored
+
+    def _take_pending(self):
+        stored = self.pending
+        self.pending = []
+        self.pending_bytes = 0
+        return stored
+
+    def flush(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+            return self._take_pending()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            return self._take_pending()
+
+def _flat(value):
+    # nested values (lists of hashtags, stickers, picture formats, ...) are stored as JSON text
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+def flatten_package(metadata_package):
+    """
+    Splits a metadata package into rows of the tables videos, files, music, authors and hashtags.
+    All rows carry the video ID, nested values are JSON text.
+    """
+    video_id = metadata_package["video_metadata"]["id"]
+    video_row = {key: _flat(value) for key, value in metadata_package["video_metadata"].items()}
+    video_row["error_code"] = metadata_package.get("error_code")
+    video_row["exception"] = metadata_package.get("exception")
+    rows = {"videos": [video_row],
+            "files": [dict({"video_id": video_id}, **{key: _flat(value) for key, value in metadata_package.get("file_metadata", {}).items()})]}
+    if "music_metadata" in metadata_package:
+        rows["music"] = [dict({"video_id": video_id}, **{key: _flat(value) for key, value in metadata_package["music_metadata"].items()})]
+    if "author_metadata" in metadata_package:
+        rows["authors"] = [dict({"video_id": video_id}, **{key: _flat(value) for key, value in metadata_package["author_metadata"].items()})]
+    rows["hashtags"] = [dict({"video_id": video_id}, **{key: _flat(value) for key, value in hashtag.items()})
+                        for hashtag in metadata_package.get("hashtags_metadata") or []]
+    return rows
+
+def _columns(rows):
+    keys = {}
+    for row in rows:
+        for key in row:
+            keys.setdefault(key, None)
+    return {key: [row.get(key) for row in rows] for key in keys}
+
+class ColumnarSink:
+    """
+    Flattens packages into the tables videos, files, music, authors and hashtags (see flatten_package)
+    and writes them in parts of rows_per_part videos: <table>-<n>.parquet if pyarrow is installed,
+    otherwise <table>-<n>.pkl (pickled dict of columns). Load them with load_metadata().
+    Buffered packages are only reported as stored once their part is written.
+    """
+    def __init__(self, directory, rows_per_part = 50_000, file_format = None):
+        if file_format is None:
+            try:
+                import pyarrow
+                file_format = "parquet"
+            except ImportError:
+                file_format = "pickle"
+        if file_format not in ("parquet", "pickle"):
+            raise ValueError(f"file_format must be 'parquet' or 'pickle', not {file_format!r}")
+        self.directory = directory
+        self.rows_per_part = rows_per_part
+        self.file_format = file_format
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.buffer = {table: [] for table in TABLES}
+        self.pending = []
+        self.part_index = len(glob.glob(os.path.join(directory, "videos-*")))
+
+    def write(self, metadata_package):
+        rows = flatten_package(metadata_package)
+        with self.lock:
+            for table, table_rows in rows.items():
+                self.buffer[table].extend(table_rows)
+            self.pending.append(package_outcome(metadata_package))
+            if len(self.pending) >= self.rows_per_part:
+                return self._write_part()
+        return []
+
+    def flush(self):
+        with self.lock:
+            return self._write_part()
+
+    def close(self):
+        return self.flush()
+
+    def _write_part(self):
+        if not self.pending:
+            return []
+        self.part_index += 1
+        for table in TABLES:
+            columns = _columns(self.buffer[table])
+            path = os.path.join(self.directory, f"{table}-{self.part_index:06d}")
+            if self.file_format == "parquet":
+                self._write_parquet(columns, path + ".parquet")
+            else:
+                with atomic_write(path + ".pkl") as f:
+                    pickle.dump(columns, f, protocol=pickle.HIGHEST_PROTOCOL)
+        stored = self.pending
+        self.buffer = {table: [] for table in TABLES}
+        self.pending = []
+        return stored
+
+    @staticmethod
+    def _write_parquet(columns, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        arrays = {}
+        for key, values in columns.items():
+            try:
+                arrays[key] = pa.array(values)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # mixed types in one column (e.g. int and str), stored as text
+                arrays[key] = pa.array([None if value is None else str(value) for value in values], type=pa.string())
+        with atomic_write(path) as f:
+            pq.write_table(pa.table(arrays), f)
+
+def _read_jsonl(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                if line.endswith("\n"):
+                    yield json.loads(line)
+        except EOFError:
+            # compressed file of a crashed run, everything before is readable
+            return None
+
+def load_metadata(directory, table = "videos"):
+    """
+    Loads one table (videos, files, music, authors or hashtags) written by a
+    ColumnarSink or JSONLSink in directory into a pandas DataFrame.
+    """
+    import pandas as pd
+    if table not in TABLES:
+        raise ValueError(f"table must be one of {TABLES}, not {table!r}")
+
+    frames = []
+    for path in sorted(glob.glob(os.path.join(directory, f"{table}-*.parquet"))):
+        frames.append(pd.read_parquet(path))
+    for path in sorted(glob.glob(os.path.join(directory, f"{table}-*.pkl"))):
+        with open(path, "rb") as f:
+            frames.append(pd.DataFrame(pickle.load(f)))
+
+    rows = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.jsonl")) + glob.glob(os.path.join(directory, "*.jsonl.gz"))):
+        for metadata_package in _read_jsonl(path):
+            rows.extend(flatten_package(metadata_package).get(table, []))
+    if rows:
+        frames.append(pd.DataFrame(_columns(rows)))
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,59 @@
+import heapq
+import itertools
+import random
+import time
+
+def retry_delay(attempt, base_delay = 3, max_delay = 300, jitter = 0.5):
+    """
+    Exponential backoff with jitter: base_delay * 2^(attempt-1), capped at max_delay,
+    randomly shortened by up to `jitter` (as a fraction) so retries do not line up.
+    """
+    delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+    return delay * (1 - jitter * random.random())
+
+class RetryScheduler:
+    """
+    Delayed queue for IDs that raised RetryLaterError.
+    Healthy IDs keep flowing while failed ones wait for their backoff to expire.
+    """
+    def __init__(self, max_attempts = 5, base_delay = 3, max_delay = 300, jitter = 0.5):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.attempts = {}
+        self.heap = []
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def schedule(self, id):
+        """
+        Counts a failed attempt of id and schedules the next one.
+        Returns False (and forgets the ID) once max_attempts is reached.
+        """
+        attempt = self.attempts.get(id, 0) + 1
+        if attempt >= self.max_attempts:
+            self.attempts.pop(id, None)
+            return False
+        self.attempts[id] = attempt
+        due = time.monotonic() + retry_delay(attempt, self.base_delay, self.max_delay, self.jitter)
+        heapq.heappush(self.heap, (due, next(self.counter), id))
+        return True
+
+    def pop_ready(self):
+        """
+        Returns an ID whose backoff has expired, or None.
+        """
+        if self.heap and self.heap[0][0] <= time.monotonic():
+            return heapq.heappop(self.heap)[2]
+        return None
+
+    def seconds_until_next(self):
+        if not self.heap:
+            return None
+        return max(0, self.heap[0][0] - time.monotonic())
+
+    def done(self, id):
+        self.attempts.pop(id, None)
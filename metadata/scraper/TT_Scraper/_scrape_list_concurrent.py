@@ -0,0 +1,111 @@
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from ._exceptions_custom import *
+from ._retry_scheduler import RetryScheduler
+
+def _scrape_list_concurrent(self, ids, scrape_content, batch_size, max_in_flight, clear_console, stream_content = False):
+    """
+    Scrapes a queue with up to max_in_flight videos at the same time.
+    The blocking requests run in a thread pool driven by an asyncio event loop,
+    pacing is done by self.rate_limiter instead of a per-iteration sleep.
+    IDs raising RetryLaterError wait in a delayed retry queue without blocking a worker.
+    """
+    asyncio.run(self._scrape_queue_async(ids, scrape_content, batch_size, max_in_flight, clear_console, stream_content))
+
+async def _scrape_queue_async(self, ids, scrape_content, batch_size, max_in_flight, clear_console, stream_content):
+    loop = asyncio.get_running_loop()
+    id_iter = iter(ids)
+    retries = RetryScheduler(self.MAX_RETRY_ATTEMPTS, self.RETRY_BASE_DELAY, self.RETRY_MAX_DELAY)
+    batch_of_metadata = []
+    last_finished = time.time()
+    too_many_errors = False
+    in_flight = 0
+
+    async def next_id():
+        # a retry whose backoff expired, otherwise the next id of the queue
+        while not too_many_errors:
+            # stop (or pause) before the disk is full, pending data is stored at the end
+            if self.disk_watchdog is not None and not await asyncio.to_thread(self.disk_watchdog.wait_for_space):
+                if not self.disk_full:
+                    self.log.warning("Disk reserve reached, stopping queue...")
+                self.disk_full = True
+                return None
+            id = retries.pop_ready()
+            if id is None:
+                id = next(id_iter, None)
+            if id is not None:
+                return id
+            # queue is empty, but running videos may still end up in the retry queue
+            if not retries and in_flight == 0:
+                return None
+            wait = retries.seconds_until_next()
+            await asyncio.sleep(0.1 if wait is None else min(wait, 0.1))
+        return None
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+
+        async def worker():
+            nonlocal batch_of_metadata, last_finished, too_many_errors, in_flight
+
+            # the event loop hands out each id to exactly one worker
+            while True:
+                id = await next_id()
+                if id is None:
+                    return None
+
+                # scraping
+                self.log.info(f"-> id {id}")
+                in_flight += 1
+                try:
+                    metadata_package, content_binary = await loop.run_in_executor(executor, partial(self.scrape, id=id, scrape_content=scrape_content, download_metadata=False, download_content=False, stream_content=stream_content, retry=False))
+                except RetryLaterError:
+                    if retries.schedule(id):
+                        self.log.warning("-> video moved to retry queue")
+                        continue
+                    metadata_package, content_binary = self._exception_handler(str(id), "R", "RetryLaterError"), None
+                finally:
+                    in_flight -= 1
+                retries.done(id)
+                metadata_package["content_binary"] = content_binary
+                if "error_code" not in metadata_package:
+                    self.repeated_error = 0
+
+                # save data in memory until stored
+                batch_of_metadata.append(metadata_package)
+
+                # statistics, iteration time is the time between two finished videos
+                now = time.time()
+                self.iterations += 1
+                self._track_progress(metadata_package)
+                self.ITER_TIME = now - last_finished
+                last_finished = now
+                self._logging_queue_progress()
+
+                # stored batch of data
+                if len(batch_of_metadata) >= batch_size:
+                    self.log.info("\nstoring data batch...\n")
+                    full_batch, batch_of_metadata = batch_of_metadata, []
+                    await asyncio.to_thread(self._store_batch, full_batch)
+
+                # interrupt if too many errors in a row
+                if self.repeated_error > self.ALLOW_REPEATED_ERRORS:
+                    too_many_errors = True
+
+                # end of loop
+                if clear_console:
+                    self._clear_console()
+
+        await asyncio.gather(*(worker() for _ in range(max_in_flight)))
+
+    if batch_of_metadata:
+        self.log.info("Final output...")
+        await asyncio.to_thread(self._store_batch, batch_of_metadata)
+
+    if too_many_errors:
+        self.log.error("Too many Errors in a row!")
+        self.log.error("Stopping program...")
+        sys.exit(TOO_MANY_ERRORS_EXIT_CODE)
@@ -0,0 +1,97 @@
+import time
+import sys
+
+from ._exceptions_custom import *
+from ._retry_scheduler import RetryScheduler
+
+def _scrape_list_sequential(self, ids, scrape_content, batch_size, clear_console, stream_content = False):
+    """
+    Scrapes a queue one video after another, each iteration is padded to WAIT_TIME.
+    IDs raising RetryLaterError are moved to a delayed retry queue,
+    the next IDs are scraped in the meantime.
+    """
+    id_iter = iter(ids)
+    retries = RetryScheduler(self.MAX_RETRY_ATTEMPTS, self.RETRY_BASE_DELAY, self.RETRY_MAX_DELAY)
+
+    # scrape batches of data
+    batch_of_metadata = []
+    while True:
+        # stop (or pause) before the disk is full, pending data is stored below
+        if self.disk_watchdog is not None and not self.disk_watchdog.wait_for_space():
+            self.log.warning("Disk reserve reached, stopping queue...")
+            self.disk_full = True
+            break
+
+        # next id: a retry whose backoff expired, otherwise the next id of the queue
+        id = retries.pop_ready()
+        if id is None:
+            id = next(id_iter, None)
+        if id is None:
+            if not retries:
+                break
+            time.sleep(retries.seconds_until_next())
+            continue
+
+        # logging
+        start = time.time()
+        self._logging_queue_progress()
+
+        # scraping
+        self.log.info(f"-> id {id}")
+        try:
+            metadata_package, content_binary = self.scrape(id=id, scrape_content=scrape_content, download_metadata=False, download_content=False, stream_content=stream_content, retry=False)
+        except RetryLaterError:
+            metadata_package, content_binary = None, None
+            if retries.schedule(id):
+                self.log.warning("-> video moved to retry queue")
+            else:
+                metadata_package = self._exception_handler(str(id), "R", "RetryLaterError")
+
+        if metadata_package is not None:
+            retries.done(id)
+            self.iterations += 1
+            self._track_progress(metadata_package)
+            metadata_package["content_binary"] = content_binary
+            if "error_code" not in metadata_package:
+                self.repeated_error = 0
+
+            # save data in memory until stored
+            batch_of_metadata.append(metadata_package)
+
+        #with open(f"test_batch.json", "w", encoding="utf-8") as f:
+        #    json.dump(batch_of_metadata, f, ensure_ascii=False, indent=4)
+        
+        # stored batch of data
+        if len(batch_of_metadata) >= batch_size:
+            # store metadata (see metadata_sink) and write mp4s to output dir
+            self.log.info("\nstoring data batch...\n")
+            self._store_batch(batch_of_metadata)
+            
+            # clean up
+            batch_of_metadata = []
+
+        # measure time and set wait time (not needed if requests are rate limited)
+        stop = time.time()
+        self.ITER_TIME = stop - start
+        if self.rate_limiter is None:
+            wait_time_left = max(0, self.WAIT_TIME - self.ITER_TIME)
+        else:
+            wait_time_left = 0
+        time.sleep(wait_time_left)
+        self.ITER_TIME = self.ITER_TIME + wait_time_left
+
+        # interrupt if too many errors in a row
+        if self.repeated_error > self.ALLOW_REPEATED_ERRORS:
+            self.log.error("Too many Errors in a row!")
+            self.log.error("Stopping program...")
+            if batch_of_metadata:
+                self._store_batch(batch_of_metadata)
+            sys.exit(TOO_MANY_ERRORS_EXIT_CODE)
+        
+        # end of loop
+        if clear_console:
+            self._clear_console()
+
+    if batch_of_metadata:
+        self.log.info("Final output...")
+        self._store_batch(batch_of_metadata)
@@ -1,11 +1,18 @@
 import requests
 import ssl
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
 
 from pprint import pprint
 
 from ._exceptions_custom import *
 
-def _scrape_picture(self, metadata):
+def _scrape_picture(self, metadata, filepath = None):
+    """
+    Downloads the pictures and the audio of a slide.
+    If filepath is given, they are streamed to disk instead and returned as None.
+    With a media store, the audio is only downloaded if its music ID is not in the store yet
+    and goes to the store instead of being returned, its blob (sha256, path) is returned last.
+    """
     # get picture from web data
     try:
         metadata_images = metadata["__DEFAULT_SCOPE__"]['webapp.video-detail']['itemInfo']['itemStruct']['imagePost']['images']
@@ -15,22 +22,71 @@ def _scrape_picture(self, metadata):
 
     # get music from web data (source = https://github.com/dfreelon/pyktok/issues/38#issuecomment-2478231666)
     audio_url = metadata["__DEFAULT_SCOPE__"]['webapp.video-detail']['itemInfo']['itemStruct']["music"]["playUrl"]
+    music_id = metadata["__DEFAULT_SCOPE__"]['webapp.video-detail']['itemInfo']['itemStruct']["music"].get("id")
+    audio_blob = None
     if audio_url == "":
         print("No audio found!")
-    else:
-        audio_binary: bytes = requests.get(audio_url).content    
-    
-    # request pictures
-    picture_content_binary = (len(metadata_images)) * [None]
+    elif self.media_store is not None:
+        audio_blob = self.media_store.lookup(music_id)
+        if audio_blob is not None:
+            self.log.info(f"-> audio of music {music_id} already in the media store")
+
+    # all pictures and the audio are fetched concurrently, at most SLIDE_CONCURRENCY at a time
+    parts = []
     for i in range(len(metadata_images)):
         tt_pic_url = metadata_images[i]["imageURL"]["urlList"][0]
-        try:
-            tt_pic = self.request_and_retain_cookies(tt_pic_url)
-        except (requests.exceptions.ChunkedEncodingError, ConnectionError, requests.exceptions.ReadTimeout, requests.exceptions.ConnectionError, ssl.SSLError, requests.exceptions.SSLError):
-            raise RetryLaterError
-        
-        picture_content_binary[i] = tt_pic.content
+        parts.append((tt_pic_url, None if filepath is None else filepath.replace("*", f"slide{str(i)}.jpeg"), False))
+    fetch_audio = audio_url != "" and audio_blob is None
+    if fetch_audio:
+        # audio for the media store is kept in memory, it is hashed before it is stored
+        stream_audio = filepath is not None and self.media_store is None
+        parts.append((audio_url, filepath.replace("*", "slide_audio.mp3") if stream_audio else None, True))
+
+    with self.timers.phase("media_download") as phase:
+        results = self._fetch_slide_parts(parts)
+        for content, nbytes in results:
+            phase.add_bytes(nbytes)
+            self._count_received_bytes(nbytes)
+
+    for i in range(len(metadata_images)):
         metadata_images[i].pop("imageURL")
-    
+
+    picture_content_binary = [content for content, nbytes in results[:len(metadata_images)]]
+    audio_binary = results[-1][0] if fetch_audio else None
+    if fetch_audio and self.media_store is not None:
+        audio_blob = self.media_store.put(audio_binary, "mp3", music_id)
+        audio_binary = None
+
     picture_formats = metadata_images
-    return picture_content_binary, picture_formats, audio_binary
+    if filepath is not None:
+        return None, picture_formats, None, audio_blob
+    return picture_content_binary, picture_formats, audio_binary, audio_blob
+
+def _fetch_slide_parts(self, parts):
+    """
+    Downloads the parts (url, filename, allow_redirects) of a slide in parallel.
+    Returns a (content, nbytes) tuple per part in the original order, content is None if the part was streamed to filename.
+    If a part fails, the parts not started yet are cancelled and the first error is raised (once).
+    """
+    if not parts:
+        return []
+    executor = ThreadPoolExecutor(max_workers=min(self.SLIDE_CONCURRENCY, len(parts)), thread_name_prefix="slide")
+    try:
+        futures = [executor.submit(self._fetch_slide_part, *part) for part in parts]
+        done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in futures:
+            if future in done and future.exception() is not None:
+                raise future.exception()
+        return [future.result() for future in futures]
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def _fetch_slide_part(self, url, filename = None, allow_redirects = False):
+    try:
+        response = self.request_and_retain_cookies(url, allow_redirects=allow_redirects, stream=filename is not None)
+        if filename is None:
+            content: bytes = response.content
+            return content, len(content)
+        return None, self._stream_to_file(response, filename)
+    except (requests.exceptions.ChunkedEncodingError, ConnectionError, requests.exceptions.ReadTimeout, requests.exceptions.ConnectionError, ssl.SSLError, requests.exceptions.SSLError):
+        raise RetryLaterError
@@ -4,7 +4,11 @@ import ssl
 
 from ._exceptions_custom import *
 
-def _scrape_video(self, metadata):
+def _scrape_video(self, metadata, filepath = None):
+    """
+    Downloads the mp4 of a video and returns its content.
+    If filepath is given, the video is streamed to disk instead and None is returned.
+    """
     # edited version of pyktok.save_tiktok() (https://github.com/dfreelon/pyktok)
 
     # get video from web data
@@ -15,21 +19,35 @@ def _scrape_video(self, metadata):
     except KeyError:
         raise VideoNotFoundError
     
-    # download video content
-    try:
-        tt_video = self.request_and_retain_cookies(tt_video_url)
-    except requests.exceptions.MissingSchema:
-        # url seems to lead to a picture, not a video
-        raise VideoIsPicture
-    except (requests.exceptions.ChunkedEncodingError, ConnectionError, requests.exceptions.ReadTimeout, requests.exceptions.ConnectionError, ssl.SSLError, requests.exceptions.SSLError):
-        raise RetryLaterError
+    with self.timers.phase("media_download") as phase:
+        # download video content
+        try:
+            tt_video = self.request_and_retain_cookies(tt_video_url, stream=filepath is not None)
+        except requests.exceptions.MissingSchema:
+            # url seems to lead to a picture, not a video
+            raise VideoIsPicture
+        except (requests.exceptions.ChunkedEncodingError, ConnectionError, requests.exceptions.ReadTimeout, requests.exceptions.ConnectionError, ssl.SSLError, requests.exceptions.SSLError):
+            raise RetryLaterError
 
-    # permission error
-    if str(tt_video) == "<Response [403]>" or not tt_video:
-            print(f"\n{tt_video}")
-            print(tt_video_url)
-            tt_video_url = tt_video_url.replace("=tt_chain_token", "")
-            tt_video = self.request_and_retain_cookies(tt_video_url)
+        # permission error
+        if str(tt_video) == "<Response [403]>" or not tt_video:
+                print(f"\n{tt_video}")
+                print(tt_video_url)
+                tt_video.close()
+                tt_video_url = tt_video_url.replace("=tt_chain_token", "")
+                tt_video = self.request_and_retain_cookies(tt_video_url, stream=filepath is not None)
 
-    return tt_video.content
+        if filepath is None:
+            nbytes = len(tt_video.content)
+            phase.add_bytes(nbytes)
+            self._count_received_bytes(nbytes)
+            return tt_video.content
 
+        # a broken stream leaves no partial video.mp4 behind (_stream_to_file removes its temporary file)
+        try:
+            nbytes = self._stream_to_file(tt_video, filepath.replace("*", "video.mp4"))
+        except (requests.exceptions.ChunkedEncodingError, ConnectionError, requests.exceptions.ReadTimeout, requests.exceptions.ConnectionError, ssl.SSLError, requests.exceptions.SSLError):
+            raise RetryLaterError
+        phase.add_bytes(nbytes)
+        self._count_received_bytes(nbytes)
+        return None
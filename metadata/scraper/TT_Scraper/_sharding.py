@@ -0,0 +1,313 @@
+import gzip
+import json
+import multiprocessing
+import os
+import pickle
+import sqlite3
+from collections import defaultdict
+
+from .HTML_Scraper._atomic_write import atomic_write
+from ._completion_journal import CompletionJournal, JOURNAL_FILENAME, read_journal
+from ._metadata_sink import JSONLSink, ColumnarSink
+from ._sqlite_store import SQLiteSink, SCHEMA
+from ._storage_layout import PackStore, PACK_DIRNAME, id_hash
+
+SHARD_DIR_PREFIX = "shard_"
+# exists while a shard scrapes, its sink outputs are only merged once it is gone
+RUNNING_FILENAME = "shard.running"
+# metadata sinks by name (sink objects cannot be passed to a worker process), each shard
+# creates its own in its output folder: (file or folder name, factory)
+SHARD_SINKS = {
+    "jsonl": ("metadata", lambda path: JSONLSink(path)),
+    "jsonl.gz": ("metadata", lambda path: JSONLSink(path, compression="gzip")),
+    "columnar": ("tables", lambda path: ColumnarSink(path)),
+    "sqlite": ("metadata.sqlite", lambda path: SQLiteSink(path)),
+}
+
+def shard_of(id, n_shards):
+    """
+    Stable shard of an ID, the same on every machine and run (see id_hash).
+    """
+    return id_hash(id) % n_shards
+
+def shard_ids(ids, shard_index, n_shards):
+    return [id for id in ids if shard_of(id, n_shards) == shard_index]
+
+def shard_output_fp(output_files_fp, shard_index, n_shards):
+    """
+    Output folder of one shard inside the merged output folder, e.g. data/shard_002_of_008/
+    """
+    return os.path.join(output_files_fp, f"{SHARD_DIR_PREFIX}{shard_index:03d}_of_{n_shards:03d}", "")
+
+def scrape_shard(ids, shard_index, n_shards, output_files_fp = "data/", wait_time = 0.35, browser_name = None, requests_per_second = None, layout = "flat", packfile = False, metadata_sink = None, **scrape_kwargs):
+    """
+    Scrapes the IDs of one shard with its own TT_Scraper (session, cookies, rate budget)
+    into its own output folder and journal. ids can be the full list, other shards' IDs are dropped.
+    Restarting a killed shard with the same arguments resumes it from its journal.
+    requests_per_second is the budget of this shard. layout and packfile are passed to TT_Scraper,
+    metadata_sink is the name of a sink in SHARD_SINKS (None: one JSON file per video).
+    """
+    from . import TT_Scraper
+    if metadata_sink is not None and metadata_sink not in SHARD_SINKS:
+        raise ValueError(f"metadata_sink must be one of {tuple(SHARD_SINKS)}, not {metadata_sink!r}")
+    ids = shard_ids(ids, shard_index, n_shards)
+    shard_fp = shard_output_fp(output_files_fp, shard_index, n_shards)
+    tt = TT_Scraper(wait_time=wait_time, output_files_fp=shard_fp, browser_name=browser_name, layout=layout, packfile=packfile)
+    tt.log.info(f"Shard {shard_index + 1} / {n_shards}: {len(ids):,} IDs")
+
+    running_path = os.path.join(shard_fp, RUNNING_FILENAME)
+    with open(running_path, "w", encoding="utf-8") as f:
+        f.write(f"{os.getpid()}\n")
+    sink = None
+    try:
+        if metadata_sink is not None:
+            name, create_sink = SHARD_SINKS[metadata_sink]
+            sink = create_sink(os.path.join(shard_fp, name))
+        tt.scrape_list(ids, requests_per_second=requests_per_second, metadata_sink=sink, **scrape_kwargs)
+    finally:
+        if sink is not None:
+            sink.close()
+        tt.close()
+        os.remove(running_path)
+
+def scrape_sharded(ids, n_shards, output_files_fp = "data/", wait_time = 0.35, browser_name = None, requests_per_second = None, layout = "flat", packfile = False, metadata_sink = None, merge = True, **scrape_kwargs):
+    """
+    Scrapes ids with n_shards worker processes, every ID is assigned to a shard by shard_of().
+    requests_per_second is the total budget, split evenly between the shards.
+    A crashing or killed shard does not stop the others, its exit code is returned
+    (TOO_MANY_ERRORS_EXIT_CODE if it stopped after too many errors in a row)
+    and it can be restarted alone with scrape_shard().
+    With merge, the outputs of all shards are merged into output_files_fp afterwards.
+    Further keyword arguments are passed to scrape_list.
+    Returns {shard_index: exit code}.
+    """
+    if requests_per_second is not None:
+        requests_per_second = requests_per_second / n_shards
+    scrape_kwargs.setdefault("clear_console", False)
+
+    shards = [[] for _ in range(n_shards)]
+    for id in ids:
+        shards[shard_of(id, n_shards)].append(id)
+
+    # spawn: the parent may already run threads (e.g. a disk watchdog), which fork does not copy safely
+    context = multiprocessing.get_context("spawn")
+    processes = {}
+    for shard_index, shard in enumerate(shards):
+        process = context.Process(target=scrape_shard,
+                                  args=(shard, shard_index, n_shards, output_files_fp, wait_time, browser_name, requests_per_second,
+                                        layout, packfile, metadata_sink),
+                                  kwargs=scrape_kwargs,
+                                  name=f"{SHARD_DIR_PREFIX}{shard_index:03d}")
+        process.start()
+        processes[shard_index] = process
+
+    exitcodes = {}
+    for shard_index, process in processes.items():
+        process.join()
+        exitcodes[shard_index] = process.exitcode
+
+    if merge:
+        merge_shards(output_files_fp)
+    return exitcodes
+
+def _shard_dirs(output_files_fp):
+    return sorted(os.path.join(output_files_fp, name) for name in os.listdir(output_files_fp)
+                  if name.startswith(SHARD_DIR_PREFIX) and os.path.isdir(os.path.join(output_files_fp, name)))
+
+def _package_dirs(shard_dir):
+    """
+    Folders of a shard that hold package files: the shard folder itself (flat layout)
+    and its hash prefix folders (sharded layout, e.g. 3f/a9/), relative to the shard folder.
+    """
+    yield ""
+    for first in os.listdir(shard_dir):
+        if len(first) != 2 or not os.path.isdir(os.path.join(shard_dir, first)):
+            continue
+        for second in os.listdir(os.path.join(shard_dir, first)):
+            if len(second) == 2 and os.path.isdir(os.path.join(shard_dir, first, second)):
+                yield os.path.join(first, second)
+
+def _merged_filepath(filepath, shard_dir, output_files_fp):
+    # same layout folder in the merged folder
+    return os.path.join(output_files_fp, os.path.relpath(filepath, shard_dir))
+
+def _move_package_files(filenames, shard_dir, output_files_fp):
+    """
+    Moves the files of one package (relative to the shard folder) into the same folder of the
+    merged folder, the filepath in its metadata is rewritten to the new location.
+    """
+    for filename in filenames:
+        source = os.path.join(shard_dir, filename)
+        target = os.path.join(output_files_fp, filename)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if filename.endswith("_metadata.json"):
+            with open(source, "r", encoding="utf-8") as f:
+                metadata_package = json.load(f)
+            id = os.path.basename(filename)[len("tiktok_"):-len("_metadata.json")]
+            if "file_metadata" in metadata_package:
+                metadata_package["file_metadata"]["filepath"] = os.path.join(os.path.dirname(target), f"tiktok_{id}_*")
+            with atomic_write(target, "w", encoding="utf-8") as f:
+                json.dump(metadata_package, f, ensure_ascii=False, indent=4)
+            os.remove(source)
+        else:
+            os.replace(source, target)
+
+def _merge_jsonl(source_dir, target_dir, shard_dir, output_files_fp):
+    os.makedirs(target_dir, exist_ok=True)
+    for name in sorted(os.listdir(source_dir)):
+        if not (name.endswith(".jsonl") or name.endswith(".jsonl.gz")):
+            continue
+        opener = gzip.open if name.endswith(".gz") else open
+        # unique in the merged folder: metadata-shard_000_of_004-000001.jsonl
+        prefix, index = name.split("-", 1)
+        target = os.path.join(target_dir, f"{prefix}-{os.path.basename(shard_dir)}-{index}")
+        with opener(os.path.join(source_dir, name), "rb") as source, atomic_write(target) as raw:
+            f = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) if name.endswith(".gz") else raw
+            try:
+                for line in source:
+                    if not line.endswith(b"\n"):
+                        # cut off by a crash, the ID was never recorded as stored
+                        break
+                    metadata_package = json.loads(line)
+                    file_metadata = metadata_package.get("file_metadata") or {}
+                    if file_metadata.get("filepath"):
+                        file_metadata["filepath"] = _merged_filepath(file_metadata["filepath"], shard_dir, output_files_fp)
+                    f.write((json.dumps(metadata_package, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8"))
+            except EOFError:
+                # compressed file of a crashed run, everything before is readable
+                pass
+            finally:
+                if f is not raw:
+                    f.close()
+        os.remove(os.path.join(source_dir, name))
+
+def _merge_columnar(source_dir, target_dir, shard_dir, output_files_fp):
+    os.makedirs(target_dir, exist_ok=True)
+    for name in sorted(os.listdir(source_dir)):
+        if not (name.endswith(".parquet") or name.endswith(".pkl")):
+            continue
+        table, part = name.split("-", 1)
+        source = os.path.join(source_dir, name)
+        target = os.path.join(target_dir, f"{table}-{os.path.basename(shard_dir)}-{part}")
+        if table != "files":
+            os.replace(source, target)
+            continue
+        if name.endswith(".parquet"):
+            import pyarrow.parquet as pq
+            columns = pq.read_table(source).to_pydict()
+        else:
+            with open(source, "rb") as f:
+                columns = pickle.load(f)
+        if "filepath" in columns:
+            columns["filepath"] = [None if filepath is None else _merged_filepath(filepath, shard_dir, output_files_fp)
+                                   for filepath in columns["filepath"]]
+        if name.endswith(".parquet"):
+            ColumnarSink._write_parquet(columns, target)
+        else:
+            with atomic_write(target) as f:
+                pickle.dump(columns, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.remove(source)
+
+def _merge_sqlite(source, target, shard_dir, output_files_fp):
+    """
+    Upserts all rows of a shard database into the merged one, the latest shard wins.
+    """
+    def merged_file_metadata(file_metadata):
+        if file_metadata is None:
+            return None
+        file_metadata = json.loads(file_metadata)
+        if file_metadata.get("filepath"):
+            file_metadata["filepath"] = _merged_filepath(file_metadata["filepath"], shard_dir, output_files_fp)
+        return json.dumps(file_metadata, ensure_ascii=False)
+
+    connection = sqlite3.connect(target, timeout=60)
+    try:
+        connection.executescript(SCHEMA)
+        connection.create_function("merged_file_metadata", 1, merged_file_metadata)
+        connection.execute("ATTACH DATABASE ? AS shard", (source,))
+        with connection:
+            connection.execute("""INSERT OR REPLACE INTO videos SELECT id, author_id, music_id, time_created, description, playcount, diggcount,
+                                  error_code, exception, video_metadata, merged_file_metadata(file_metadata) FROM shard.videos""")
+            for table in ("authors", "music", "hashtags"):
+                connection.execute(f"INSERT OR REPLACE INTO {table} SELECT * FROM shard.{table}")
+            # the hashtags of a re-scraped video replace the old ones
+            connection.execute("DELETE FROM video_hashtags WHERE video_id IN (SELECT id FROM shard.videos)")
+            connection.execute("INSERT OR REPLACE INTO video_hashtags SELECT * FROM shard.video_hashtags")
+        connection.execute("DETACH DATABASE shard")
+    finally:
+        connection.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(source + suffix):
+            os.remove(source + suffix)
+
+def _merge_sinks(shard_dir, output_files_fp):
+    """
+    Merges the metadata sink outputs of a shard (see SHARD_SINKS) file by file.
+    """
+    merged = set()
+    for metadata_sink, (name, _) in SHARD_SINKS.items():
+        source = os.path.join(shard_dir, name)
+        if name in merged or not os.path.exists(source):
+            continue
+        merged.add(name)
+        target = os.path.join(output_files_fp, name)
+        if metadata_sink == "sqlite":
+            _merge_sqlite(source, target, shard_dir, output_files_fp)
+        elif metadata_sink == "columnar":
+            _merge_columnar(source, target, shard_dir, output_files_fp)
+        else:
+            _merge_jsonl(source, target, shard_dir, output_files_fp)
+
+def merge_shards(output_files_fp = "data/"):
+    """
+    Merges the journals and outputs of all shard folders in output_files_fp into output_files_fp.
+    Package files (flat or sharded layout) and pack entries are merged per ID, and only for IDs in
+    a shard's journal, so files still being written by a running shard stay where they are.
+    The files of an ID are moved before it is recorded in the merged journal, the latest entry of an ID wins.
+    Metadata sink outputs (JSONL files, columnar parts, SQLite database) are merged as a whole,
+    and only from shards that are not running. Merging again (e.g. after a shard was restarted)
+    only moves what is new. Returns the number of merged IDs.
+    """
+    merged = CompletionJournal(os.path.join(output_files_fp, JOURNAL_FILENAME))
+    merged_packs = None
+    n_merged = 0
+    try:
+        for shard_dir in _shard_dirs(output_files_fp):
+            outcomes, _ = read_journal(os.path.join(shard_dir, JOURNAL_FILENAME))
+            running = os.path.exists(os.path.join(shard_dir, RUNNING_FILENAME))
+
+            # files of the shard grouped by ID: [<layout folder>/]tiktok_<id>_<name>
+            files = defaultdict(list)
+            for directory in _package_dirs(shard_dir):
+                for filename in os.listdir(os.path.join(shard_dir, directory)):
+                    if filename.startswith("tiktok_") and not filename.endswith(".part"):
+                        files[filename.split("_", 2)[1]].append(os.path.join(directory, filename))
+
+            shard_packs = None
+            if os.path.isdir(os.path.join(shard_dir, PACK_DIRNAME)):
+                shard_packs = PackStore(os.path.join(shard_dir, PACK_DIRNAME))
+                if merged_packs is None:
+                    merged_packs = PackStore(os.path.join(output_files_fp, PACK_DIRNAME))
+
+            for id, (outcome, timestamp) in outcomes.items():
+                entry = merged.outcomes.get(id)
+                if entry is not None and entry[1] >= timestamp:
+                    continue
+                _move_package_files(files.get(id, []), shard_dir, output_files_fp)
+                if shard_packs is not None:
+                    for name in shard_packs.names(id):
+                        merged_packs.append(name, shard_packs.read(name))
+                merged.record(id, outcome, timestamp)
+                n_merged += 1
+
+            if not running:
+                _merge_sinks(shard_dir, output_files_fp)
+                if shard_packs is not None and all(name in merged_packs for name in shard_packs.entries):
+                    # every entry is in the merged packs now
+                    for name in os.listdir(shard_packs.directory):
+                        os.remove(os.path.join(shard_packs.directory, name))
+    finally:
+        merged.close()
+        if merged_packs is not None:
+            merged_packs.close()
+    return n_merged
@@ -0,0 +1,191 @@
+import json
+import sqlite3
+import threading
+
+from ._metadata_sink import package_outcome
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY,
+    author_id INTEGER,
+    music_id INTEGER,
+    time_created TEXT,
+    description TEXT,
+    playcount INTEGER,
+    diggcount INTEGER,
+    error_code TEXT,
+    exception TEXT,
+    video_metadata TEXT,
+    file_metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS videos_author_id ON videos (author_id);
+CREATE INDEX IF NOT EXISTS videos_music_id ON videos (music_id);
+CREATE INDEX IF NOT EXISTS videos_time_created ON videos (time_created);
+
+CREATE TABLE IF NOT EXISTS authors (
+    id INTEGER PRIMARY KEY,
+    username TEXT,
+    name TEXT,
+    verified INTEGER,
+    private_account INTEGER,
+    author_metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS authors_username ON authors (username);
+
+CREATE TABLE IF NOT EXISTS music (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    author_name TEXT,
+    original INTEGER,
+    music_metadata TEXT
+);
+
+CREATE TABLE IF NOT EXISTS hashtags (
+    name TEXT PRIMARY KEY,
+    id INTEGER,
+    description TEXT,
+    hashtag_metadata TEXT
+);
+
+CREATE TABLE IF NOT EXISTS video_hashtags (
+    video_id INTEGER NOT NULL,
+    hashtag_name TEXT NOT NULL,
+    position INTEGER,
+    PRIMARY KEY (video_id, hashtag_name)
+);
+CREATE INDEX IF NOT EXISTS video_hashtags_hashtag_name ON video_hashtags (hashtag_name);
+"""
+
+def _json(value):
+    return None if value is None else json.dumps(value, ensure_ascii=False)
+
+class SQLiteSink:
+    """
+    Metadata sink upserting packages into a local SQLite database, batch_size packages per transaction.
+    Authors, music and hashtags are dimension tables keyed by their ID (name for hashtags),
+    so each of them is stored once no matter how many videos share it; the latest version wins.
+    The full sections are kept as JSON next to the indexed columns, get_video() reassembles a package.
+    """
+    def __init__(self, path, batch_size = 500):
+        self.path = path
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.pending = []
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def write(self, metadata_package):
+        with self.lock:
+            self.pending.append(metadata_package)
+            if len(self.pending) >= self.batch_size:
+                return self._upsert_pending()
+        return []
+
+    def flush(self):
+        with self.lock:
+            return self._upsert_pending()
+
+    def close(self):
+        stored = self.flush()
+        with self.lock:
+            self.connection.close()
+        return stored
+
+    def _upsert_pending(self):
+        if not self.pending:
+            return []
+        videos, authors, music, hashtags, video_hashtags = [], {}, {}, {}, []
+        for metadata_package in self.pending:
+            video_metadata = metadata_package["video_metadata"]
+            video_id = video_metadata["id"]
+            videos.append((video_id, video_metadata.get("author_id"), video_metadata.get("music_id"), video_metadata.get("time_created"),
+                           video_metadata.get("description"), video_metadata.get("playcount"), video_metadata.get("diggcount"),
+                           metadata_package.get("error_code"), metadata_package.get("exception"),
+                           _json(video_metadata), _json(metadata_package.get("file_metadata"))))
+
+            author_metadata = metadata_package.get("author_metadata")
+            if author_metadata and author_metadata.get("id") is not None:
+                authors[author_metadata["id"]] = (author_metadata["id"], author_metadata.get("username"), author_metadata.get("name"),
+                                                  author_metadata.get("verified"), author_metadata.get("private_account"), _json(author_metadata))
+            music_metadata = metadata_package.get("music_metadata")
+            if music_metadata and music_metadata.get("id") is not None:
+                music[music_metadata["id"]] = (music_metadata["id"], music_metadata.get("title"), music_metadata.get("author_name"),
+                                               music_metadata.get("original"), _json(music_metadata))
+            for position, hashtag in enumerate(metadata_package.get("hashtags_metadata") or []):
+                if not hashtag.get("name"):
+                    continue
+                hashtags[hashtag["name"]] = (hashtag["name"], hashtag.get("id"), hashtag.get("description"), _json(hashtag))
+                video_hashtags.append((video_id, hashtag["name"], position))
+
+        with self.connection:
+            self.connection.executemany("""INSERT INTO videos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                           ON CONFLICT(id) DO UPDATE SET author_id=excluded.author_id, music_id=excluded.music_id,
+                                           time_created=excluded.time_created, description=excluded.description, playcount=excluded.playcount,
+                                           diggcount=excluded.diggcount, error_code=excluded.error_code, exception=excluded.exception,
+                                           video_metadata=excluded.video_metadata, file_metadata=excluded.file_metadata""", videos)
+            self.connection.executemany("""INSERT INTO authors VALUES (?, ?, ?, ?, ?, ?)
+                                           ON CONFLICT(id) DO UPDATE SET username=excluded.username, name=excluded.name, verified=excluded.verified,
+                                           private_account=excluded.private_account, author_metadata=excluded.author_metadata""", authors.values())
+            self.connection.executemany("""INSERT INTO music VALUES (?, ?, ?, ?, ?)
+                                           ON CONFLICT(id) DO UPDATE SET title=excluded.title, author_name=excluded.author_name,
+                                           original=excluded.original, music_metadata=excluded.music_metadata""", music.values())
+            self.connection.executemany("""INSERT INTO hashtags VALUES (?, ?, ?, ?)
+                                           ON CONFLICT(name) DO UPDATE SET id=excluded.id, description=excluded.description,
+                                           hashtag_metadata=excluded.hashtag_metadata""", hashtags.values())
+            # the hashtags of a re-scraped video replace the old ones
+            self.connection.executemany("DELETE FROM video_hashtags WHERE video_id = ?", [(video[0],) for video in videos])
+            self.connection.executemany("INSERT OR REPLACE INTO video_hashtags VALUES (?, ?, ?)", video_hashtags)
+
+        stored = [package_outcome(metadata_package) for metadata_package in self.pending]
+        self.pending = []
+        return stored
+
+    # query helpers
+
+    def _query(self, sql, parameters = ()):
+        with self.lock:
+            return [dict(row) for row in self.connection.execute(sql, parameters)]
+
+    def get_video(self, video_id):
+        """
+        Reassembles the metadata package of a video, None if it is not stored.
+        """
+        rows = self._query("""SELECT v.error_code, v.exception, v.video_metadata, v.file_metadata, a.author_metadata, m.music_metadata
+                              FROM videos v LEFT JOIN authors a ON a.id = v.author_id LEFT JOIN music m ON m.id = v.music_id
+                              WHERE v.id = ?""", (int(video_id),))
+        if not rows:
+            return None
+        row = rows[0]
+        metadata_package = {"video_metadata": json.loads(row["video_metadata"]),
+                            "file_metadata": json.loads(row["file_metadata"]) if row["file_metadata"] else {}}
+        if row["error_code"] is not None:
+            metadata_package["error_code"] = row["error_code"]
+            metadata_package["exception"] = row["exception"]
+            return metadata_package
+        metadata_package["music_metadata"] = json.loads(row["music_metadata"]) if row["music_metadata"] else None
+        metadata_package["author_metadata"] = json.loads(row["author_metadata"]) if row["author_metadata"] else None
+        metadata_package["hashtags_metadata"] = [json.loads(hashtag["hashtag_metadata"]) for hashtag in self._query(
+                                                 """SELECT h.hashtag_metadata FROM video_hashtags vh JOIN hashtags h ON h.name = vh.hashtag_name
+                                                    WHERE vh.video_id = ? ORDER BY vh.position""", (int(video_id),))]
+        return metadata_package
+
+    def videos_by_author(self, author_id):
+        return self._query("SELECT id, time_created, description, playcount, diggcount FROM videos WHERE author_id = ? ORDER BY time_created", (int(author_id),))
+
+    def videos_by_hashtag(self, hashtag_name):
+        return self._query("""SELECT v.id, v.author_id, v.time_created, v.description FROM video_hashtags vh JOIN videos v ON v.id = vh.video_id
+                              WHERE vh.hashtag_name = ? ORDER BY v.time_created""", (hashtag_name,))
+
+    def videos_created_between(self, start, end):
+        """
+        Videos created in [start, end), ISO timestamps like video_metadata["time_created"].
+        """
+        return self._query("SELECT id, author_id, time_created, description FROM videos WHERE time_created >= ? AND time_created < ? ORDER BY time_created", (start, end))
+
+    def counts(self):
+        with self.lock:
+            return {table: self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    for table in ("videos", "authors", "music", "hashtags", "video_hashtags")}
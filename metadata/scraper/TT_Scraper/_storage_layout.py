@@ -0,0 +1,208 @@
+import glob
+import json
+import os
+import shutil
+import threading
+import zlib
+from collections import defaultdict
+
+from .HTML_Scraper._atomic_write import atomic_write
+
+LAYOUTS = ("flat", "sharded")
+PACK_DIRNAME = "packs"
+
+def id_hash(id):
+    """
+    Stable hash of a video ID: the same on every machine, Python version and run
+    (unlike hash(), which is salted per process). Picks the layout folder and the shard of an ID.
+    """
+    return zlib.crc32(str(id).encode("ascii"))
+
+def layout_dir(output_files_fp, id, layout = "flat"):
+    """
+    Folder of the files of a video: output_files_fp itself (flat) or two levels of
+    hash prefixes (sharded), e.g. data/3f/a9/ - 65,536 folders, a few files each even for millions of videos.
+    """
+    if layout == "flat":
+        return output_files_fp
+    prefix = f"{id_hash(id):08x}"
+    return os.path.join(output_files_fp, prefix[:2], prefix[2:4], "")
+
+def _video_id_of(name):
+    # tiktok_<id>_<name>
+    return name.split("_", 2)[1]
+
+class PackStore:
+    """
+    Media files appended to large pack files (pack-<n>.bin) with a sidecar index (pack-<n>.idx):
+        <name>\\t<offset>\\t<length>
+    The data is flushed before its index line is written, so a crash never leaves an index entry
+    without data. All index entries are held in memory, reading a file is one seek.
+    Every PackStore appends to packs it created itself (exclusively, see _open_pack), so processes
+    sharing the folder never write to the same pack. A new pack is started once max_pack_bytes are reached.
+    """
+    def __init__(self, directory, max_pack_bytes = 4 * 1024**3):
+        self.directory = directory
+        self.max_pack_bytes = max_pack_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.names_by_video = defaultdict(list)
+        self.pack_index = 0
+        self._load()
+        self.pack_file = None
+        self.index_file = None
+
+    def _pack_path(self, pack_index, ext):
+        return os.path.join(self.directory, f"pack-{pack_index:06d}.{ext}")
+
+    def _load(self):
+        for index_path in sorted(glob.glob(os.path.join(self.directory, "pack-*.idx"))):
+            pack_index = int(os.path.basename(index_path)[len("pack-"):-len(".idx")])
+            self.pack_index = max(self.pack_index, pack_index)
+            pack_size = os.path.getsize(self._pack_path(pack_index, "bin")) if os.path.exists(self._pack_path(pack_index, "bin")) else 0
+            with open(index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    fields = line.rstrip("\n").split("\t")
+                    if not line.endswith("\n") or len(fields) != 3:
+                        continue
+                    name, offset, length = fields[0], int(fields[1]), int(fields[2])
+                    if offset + length > pack_size:
+                        continue
+                    self._add_entry(name, pack_index, offset, length)
+
+    def _add_entry(self, name, pack_index, offset, length):
+        if name not in self.entries:
+            self.names_by_video[_video_id_of(name)].append(name)
+        self.entries[name] = (pack_index, offset, length)
+
+    def _open_pack(self):
+        if self.pack_file is not None:
+            self.pack_file.close()
+            self.index_file.close()
+        # the first free index, another process may have taken the next one since _load
+        while True:
+            self.pack_index += 1
+            try:
+                self.pack_file = open(self._pack_path(self.pack_index, "bin"), "xb")
+                break
+            except FileExistsError:
+                continue
+        self.index_file = open(self._pack_path(self.pack_index, "idx"), "a", encoding="utf-8")
+
+    def _append(self, name, write_data):
+        with self.lock:
+            if self.pack_file is None or self.pack_file.tell() >= self.max_pack_bytes:
+                self._open_pack()
+            offset = self.pack_file.tell()
+            write_data(self.pack_file)
+            self.pack_file.flush()
+            length = self.pack_file.tell() - offset
+            self.index_file.write(f"{name}\t{offset}\t{length}\n")
+            self.index_file.flush()
+            self._add_entry(name, self.pack_index, offset, length)
+        return length
+
+    def append(self, name, content):
+        """
+        Appends content (bytes) under name (e.g. tiktok_<id>_video.mp4), returns the number of bytes.
+        """
+        return self._append(name, lambda f: f.write(content))
+
+    def append_file(self, name, path):
+        """
+        Appends the content of the file path (e.g. a streamed download) under name.
+        """
+        with open(path, "rb") as source:
+            return self._append(name, lambda f: shutil.copyfileobj(source, f, 1024 * 1024))
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def names(self, video_id):
+        """
+        Names of all files of a video.
+        """
+        return list(self.names_by_video.get(str(video_id), []))
+
+    def read(self, name):
+        pack_index, offset, length = self.entries[name]
+        with open(self._pack_path(pack_index, "bin"), "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def read_video(self, video_id):
+        """
+        {name: content} of all files of a video.
+        """
+        return {name: self.read(name) for name in self.names(video_id)}
+
+    def close(self):
+        with self.lock:
+            if self.pack_file is not None:
+                self.pack_file.close()
+                self.index_file.close()
+                self.pack_file = None
+                self.index_file = None
+
+def _package_filepath(self, id):
+    """
+    Pattern of the files of a video (* is replaced by metadata.json, video.mp4, ...) in the storage layout.
+    """
+    directory = layout_dir(self.VIDEOS_OUT_FP, id, self.layout)
+    if directory not in self.layout_dirs:
+        os.makedirs(directory, exist_ok=True)
+        self.layout_dirs.add(directory)
+    return f"{directory}tiktok_{id}_*"
+
+def migrate_output(output_files_fp, layout = "sharded", packfile = False, log = print):
+    """
+    Moves the files of a flat output folder into another layout. With packfile, media files
+    are appended to packs in output_files_fp/packs/ and removed once they are in the index.
+    The filepath in moved metadata files is rewritten. Can be interrupted and run again.
+    Returns the number of migrated files.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"layout must be one of {LAYOUTS}, not {layout!r}")
+    pack_store = PackStore(os.path.join(output_files_fp, PACK_DIRNAME)) if packfile else None
+    n_files = 0
+    try:
+        with os.scandir(output_files_fp) as entries:
+            for entry in entries:
+                name = entry.name
+                if not entry.is_file() or not name.startswith("tiktok_") or name.endswith(".part"):
+                    continue
+                id = _video_id_of(name)
+                directory = layout_dir(output_files_fp, id, layout)
+
+                if name.endswith("_metadata.json"):
+                    if directory == output_files_fp:
+                        continue
+                    os.makedirs(directory, exist_ok=True)
+                    with open(entry.path, "r", encoding="utf-8") as f:
+                        metadata_package = json.load(f)
+                    if "file_metadata" in metadata_package:
+                        metadata_package["file_metadata"]["filepath"] = f"{directory}tiktok_{id}_*"
+                    target = os.path.join(directory, name)
+                    with atomic_write(target, "w", encoding="utf-8") as f:
+                        json.dump(metadata_package, f, ensure_ascii=False, indent=4)
+                    os.remove(entry.path)
+                elif pack_store is not None:
+                    if name not in pack_store:
+                        pack_store.append_file(name, entry.path)
+                    os.remove(entry.path)
+                elif directory != output_files_fp:
+                    os.makedirs(directory, exist_ok=True)
+                    os.replace(entry.path, os.path.join(directory, name))
+                else:
+                    continue
+                n_files += 1
+                if n_files % 10000 == 0:
+                    log(f"{n_files:,} files migrated")
+    finally:
+        if pack_store is not None:
+            pack_store.close()
+    return n_files
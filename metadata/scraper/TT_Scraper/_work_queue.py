@@ -0,0 +1,206 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+
+class WorkQueue:
+    """
+    Work queue of video IDs in a local SQLite file, shared by any number of worker
+    processes on the same machine (no broker needed).
+
+    Workers lease IDs for lease_seconds and acknowledge each of them with its outcome
+    ("success" or an error code). Leases that are not renewed in time (dead worker)
+    are handed to the next worker that asks. An ID whose lease expired max_attempts
+    times is acknowledged as "R" instead of being leased again.
+    """
+    def __init__(self, path, lease_seconds = 300, max_attempts = 5):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        # isolation_level=None: transactions are started explicitly with BEGIN IMMEDIATE
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS queue (
+                                    id TEXT PRIMARY KEY,
+                                    state TEXT NOT NULL,
+                                    outcome TEXT,
+                                    worker TEXT,
+                                    lease_until REAL,
+                                    attempts INTEGER NOT NULL DEFAULT 0,
+                                    updated REAL)""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS queue_state ON queue (state, lease_until)")
+
+    def _transaction(self, statements):
+        """
+        Runs statements(cursor) in a write transaction and returns its result.
+        """
+        with self.lock:
+            cursor = self.connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(cursor)
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+            return result
+
+    def add(self, ids):
+        """
+        Adds IDs as pending, IDs already in the queue are ignored. Returns the number of new IDs.
+        """
+        now = time.time()
+        rows = [(str(id), PENDING, now) for id in ids]
+        def statements(cursor):
+            before = cursor.execute("SELECT COUNT(*) FROM queue").fetchone()[0]
+            cursor.executemany("INSERT OR IGNORE INTO queue (id, state, updated) VALUES (?, ?, ?)", rows)
+            return cursor.execute("SELECT COUNT(*) FROM queue").fetchone()[0] - before
+        return self._transaction(statements)
+
+    def lease(self, worker, n = 1):
+        """
+        Leases up to n pending (or expired) IDs to worker. Returns the list of IDs.
+        """
+        def statements(cursor):
+            now = time.time()
+            # expired leases of IDs that already used up their attempts are given up
+            cursor.execute("UPDATE queue SET state = ?, outcome = 'R', worker = NULL, lease_until = NULL, updated = ? "
+                           "WHERE state = ? AND lease_until < ? AND attempts >= ?",
+                           (DONE, now, LEASED, now, self.max_attempts))
+            ids = [row[0] for row in cursor.execute("SELECT id FROM queue WHERE state = ? OR (state = ? AND lease_until < ?) LIMIT ?",
+                                                    (PENDING, LEASED, now, n))]
+            cursor.executemany("UPDATE queue SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                               [(LEASED, worker, now + self.lease_seconds, now, id) for id in ids])
+            return ids
+        return self._transaction(statements)
+
+    def renew(self, worker):
+        """
+        Extends all leases held by worker. Returns the number of renewed leases.
+        """
+        def statements(cursor):
+            now = time.time()
+            return cursor.execute("UPDATE queue SET lease_until = ?, updated = ? WHERE state = ? AND worker = ?",
+                                  (now + self.lease_seconds, now, LEASED, worker)).rowcount
+        return self._transaction(statements)
+
+    def ack(self, worker, id, outcome):
+        """
+        Marks an ID as done. Acknowledgements of IDs that were re-leased to another worker are still accepted,
+        the first outcome wins.
+        """
+        def statements(cursor):
+            return cursor.execute("UPDATE queue SET state = ?, outcome = ?, worker = ?, lease_until = NULL, updated = ? WHERE id = ? AND state != ?",
+                                  (DONE, outcome, worker, time.time(), str(id), DONE)).rowcount
+        return self._transaction(statements)
+
+    def release(self, worker):
+        """
+        Hands all IDs still leased by worker back to the queue (e.g. when it stops early).
+        """
+        def statements(cursor):
+            return cursor.execute("UPDATE queue SET state = ?, worker = NULL, lease_until = NULL, attempts = MAX(attempts - 1, 0), updated = ? WHERE state = ? AND worker = ?",
+                                  (PENDING, time.time(), LEASED, worker)).rowcount
+        return self._transaction(statements)
+
+    def requeue_errors(self):
+        """
+        Sets all IDs that finished with an error code back to pending.
+        """
+        def statements(cursor):
+            return cursor.execute("UPDATE queue SET state = ?, outcome = NULL, attempts = 0, updated = ? WHERE state = ? AND outcome != 'success'",
+                                  (PENDING, time.time(), DONE)).rowcount
+        return self._transaction(statements)
+
+    def counts(self):
+        """
+        Number of IDs per state and of done IDs per outcome.
+        """
+        with self.lock:
+            counts = {PENDING: 0, LEASED: 0, DONE: 0}
+            counts.update(dict(self.connection.execute("SELECT state, COUNT(*) FROM queue GROUP BY state")))
+            counts["outcomes"] = dict(self.connection.execute("SELECT outcome, COUNT(*) FROM queue WHERE state = ? GROUP BY outcome", (DONE,)))
+            return counts
+
+    def is_drained(self):
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM queue WHERE state != ? LIMIT 1", (DONE,)).fetchone() is None
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+class LeaseRenewer:
+    """
+    Background thread renewing the leases of a worker every interval seconds,
+    so IDs stay leased during long media downloads and while waiting for the writer.
+    """
+    def __init__(self, queue, worker, interval = None):
+        self.queue = queue
+        self.worker = worker
+        self.interval = interval or queue.lease_seconds / 3
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="lease-renewer", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.queue.renew(self.worker)
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def scrape_from_queue(self, queue, worker_id = None, lease_size = 20, poll_interval = 5, scrape_content = True, batch_size = None, clear_console = False, max_in_flight = 1, stream_content = False, **session_kwargs):
+    """
+    Worker mode: leases lease_size IDs at a time from a WorkQueue (or the path of its SQLite file),
+    scrapes them and acknowledges every stored package with its outcome.
+    All leases are scraped in one session (journal, sink, stores and writer are set up once).
+    Leases are renewed in the background. Returns once the queue is drained
+    or the disk watchdog stopped the queue. The arguments are those of scrape_list,
+    except resume and retry_errors (the queue decides what is left to do, not the local journal).
+    """
+    if not isinstance(queue, WorkQueue):
+        queue = WorkQueue(queue)
+    if worker_id is None:
+        worker_id = default_worker_id()
+
+    self.work_queue = queue
+    self.worker_id = worker_id
+    renewer = LeaseRenewer(queue, worker_id)
+    self.log.info(f"Worker {worker_id} pulling from {queue.path}")
+    try:
+        self._open_session(max_in_flight, **session_kwargs)
+        try:
+            while True:
+                ids = queue.lease(worker_id, lease_size)
+                if not ids:
+                    # packages still buffered by the writer or sink keep their IDs leased
+                    self._flush_session()
+                    if queue.is_drained():
+                        break
+                    # other workers still hold leases, which may expire
+                    time.sleep(poll_interval)
+                    continue
+                self._scrape_ids(ids, scrape_content, batch_size, max_in_flight, clear_console, stream_content)
+                if self.disk_full:
+                    break
+            self._logging_queue_progress()
+        finally:
+            self._close_session()
+    finally:
+        renewer.close()
+        # IDs not stored (stopped early) go back to the queue
+        queue.release(worker_id)
+        self.work_queue = None
+    self.log.info(f"Worker {worker_id} done: {queue.counts()}")
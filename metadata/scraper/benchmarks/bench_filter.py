@@ -0,0 +1,81 @@
+"""
+Compares _filter_tiktok_data (per item and in batch mode) with the hand-written
+version before the per-section lookups, frozen in benchmarks/_baseline_filter.py.
+
+Run from metadata/scraper/:
+    python -m benchmarks.bench_filter data/recorded/*.json
+
+Files can hold an itemStruct, the whole rehydration JSON of a page or one of them per line.
+Without arguments synthetic items are used.
+"""
+import argparse
+import copy
+import json
+import time
+
+from TT_Scraper._filter_tiktok_data import _force_to_int, _prep_hashtags_and_mentions, _filter_tiktok_data, _filter_tiktok_batch
+from benchmarks import _baseline_filter
+from benchmarks.bench_hashtags import load_items
+
+class Scraper:
+    _force_to_int = _force_to_int
+    _prep_hashtags_and_mentions = _prep_hashtags_and_mentions
+    _filter_tiktok_data = _filter_tiktok_data
+    _filter_tiktok_batch = _filter_tiktok_batch
+
+class BaselineScraper:
+    _force_to_int = _baseline_filter._force_to_int
+    _prep_hashtags_and_mentions = _baseline_filter._prep_hashtags_and_mentions
+    _filter_tiktok_data = _baseline_filter._filter_tiktok_data
+
+def synthetic_items(n_items = 500):
+    items = []
+    for i in range(n_items):
+        items.append({"id": str(7398323154424171806 + i), "createTime": str(1700000000 + i), "desc": f"Wahlkampf #btw25 #{i}",
+                      "author": {"id": str(6869180186235634694 + i % 50), "uniqueId": f"user{i % 50}", "nickname": "Name", "signature": "bio",
+                                 "verified": i % 7 == 0, "privateAccount": False, "commentSetting": 0, "duetSetting": 0},
+                      "music": {"id": str(7000000000000000000 + i % 20), "title": "original sound", "authorName": "Name", "original": True,
+                                "preciseDuration": {"preciseDuration": 12.3}},
+                      "textExtra": [{"hashtagName": "btw25", "hashtagId": "1"}, {"hashtagName": str(i), "hashtagId": str(i + 2)}, {"userId": "77"}],
+                      "challenges": [{"id": "1", "desc": "Bundestagswahl"}, {"id": str(i + 2), "desc": ""}],
+                      "video": {"duration": 30, "height": 1024, "width": 576, "ratio": "540p", "volumeInfo": {"Loudness": -14.2, "Peak": 0.9},
+                                "claInfo": {"hasOriginalAudio": True, "enableAutoCaption": False, "noCaptionReason": 3}},
+                      "stats": {"diggCount": 10, "shareCount": 1, "commentCount": 2, "playCount": 300, "collectCount": 0},
+                      "statsV2": {"diggCount": "10", "shareCount": "1", "commentCount": "2", "playCount": "300", "collectCount": "0", "repostCount": "0"},
+                      "locationCreated": "DE", "effectStickers": [], "stickersOnItem": [], "comments": [], "warnInfo": {}, "channelTags": {},
+                      "diversificationLabels": ["Politics"], "isAd": False, "duetEnabled": True, "stitchEnabled": True, "shareEnabled": True})
+    return items
+
+def bench(function, items, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(items)
+    return (time.perf_counter() - start) / (repeat * len(items))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark _filter_tiktok_data')
+    parser.add_argument('items', nargs='*', help='Recorded item structs or rehydration JSON')
+    parser.add_argument('--repeat', type=int, default=10, help='Repetitions (default: 10)')
+    args = parser.parse_args()
+
+    scraper = Scraper()
+    baseline = BaselineScraper()
+    items = load_items(args.items) or synthetic_items()
+    for item in items:
+        try:
+            expected = baseline._filter_tiktok_data(copy.deepcopy(item))
+        except (TypeError, AttributeError, ValueError):
+            # the baseline crashes on some missing keys
+            continue
+        assert json.dumps(expected) == json.dumps(scraper._filter_tiktok_data(copy.deepcopy(item)))
+
+    mean_baseline = bench(lambda items: [baseline._filter_tiktok_data(item) for item in items], items, args.repeat)
+    mean_current = bench(lambda items: [scraper._filter_tiktok_data(item) for item in items], items, args.repeat)
+    mean_batch = bench(scraper._filter_tiktok_batch, items, args.repeat)
+    print(f"{len(items)} items")
+    print(f"baseline:       {mean_baseline * 1e6:8.1f} us per item")
+    print(f"current:        {mean_current * 1e6:8.1f} us per item ({mean_baseline / mean_current:.2f}x the speed)")
+    print(f"to columns:     {mean_batch * 1e6:8.1f} us per item ({mean_baseline / mean_batch:.2f}x the speed)")
+
+if __name__ == "__main__":
+    main()
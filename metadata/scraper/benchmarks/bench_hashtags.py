@@ -0,0 +1,104 @@
+"""
+Compares the index-based challenge lookup of _prep_hashtags_and_mentions
+with the linear filter() over all challenges that was used before.
+
+Run from metadata/scraper/:
+    python -m benchmarks.bench_hashtags data/recorded/*.json
+
+Files can hold an itemStruct, the whole rehydration JSON of a page or one of them per line.
+Without arguments synthetic items with 30 hashtags are used.
+"""
+import argparse
+import json
+import time
+
+from TT_Scraper._filter_tiktok_data import _force_to_int, _prep_hashtags_and_mentions
+
+class Scraper:
+    _force_to_int = _force_to_int
+    _prep_hashtags_and_mentions = _prep_hashtags_and_mentions
+
+def prep_hashtags_with_filter(self, data_slot):
+    text_elements = data_slot.get("textExtra", None)
+    challenges = data_slot.get("challenges", None)
+
+    hashtags_metadata = []
+    mentions_list = []
+    if text_elements is not None:
+        for element in text_elements:
+            mention = element.get("userId", None)
+            if mention == None:
+                hashtag_data = {}
+                hashtag_data["name"] = element.get("hashtagName", None)
+                hashtag_data["id"] = self._force_to_int(element.get("hashtagId", None))
+                hashtag_data["type"] = element.get("type", None)
+                hashtag_data["sub_type"] = element.get("subType", None)
+                hashtag_data["is_commerce"] = element.get("isCommerce", None)
+
+                matching_callenge = list(filter(lambda x : self._force_to_int(x["id"]) == hashtag_data["id"], challenges))
+                if matching_callenge:
+                    matching_callenge = matching_callenge[0]
+                    hashtag_data["description"] = matching_callenge["desc"]
+                else:
+                    hashtag_data["description"] = None
+
+                hashtags_metadata.append(hashtag_data)
+            else:
+                mentions_list.append(mention)
+    return hashtags_metadata, mentions_list
+
+def item_struct_of(data):
+    if "__DEFAULT_SCOPE__" in data:
+        return data["__DEFAULT_SCOPE__"]["webapp.video-detail"]["itemInfo"]["itemStruct"]
+    return data
+
+def load_items(paths):
+    items = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        try:
+            items.append(item_struct_of(json.loads(text)))
+        except ValueError:
+            items.extend(item_struct_of(json.loads(line)) for line in text.splitlines() if line.strip())
+    return items
+
+def synthetic_items(n_items = 200, n_hashtags = 30):
+    items = []
+    for i in range(n_items):
+        text_extra = [{"hashtagName": f"tag{i}_{k}", "hashtagId": str(1000 * i + k), "type": 1, "subType": 0, "isCommerce": False}
+                      for k in range(n_hashtags)]
+        text_extra.append({"userId": str(i), "type": 0})
+        challenges = [{"id": str(1000 * i + k), "title": f"tag{i}_{k}", "desc": f"Challenge {k}"} for k in reversed(range(n_hashtags))]
+        items.append({"id": str(i), "textExtra": text_extra, "challenges": challenges})
+    return items
+
+def bench(prep, items, repeat):
+    scraper = Scraper()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            prep(scraper, item)
+    return (time.perf_counter() - start) / (repeat * len(items))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the challenge lookup of _prep_hashtags_and_mentions')
+    parser.add_argument('items', nargs='*', help='Recorded item structs or rehydration JSON')
+    parser.add_argument('--repeat', type=int, default=20, help='Repetitions per item (default: 20)')
+    args = parser.parse_args()
+
+    items = load_items(args.items) or synthetic_items()
+    # the old version crashes without challenges
+    comparable = [item for item in items if item.get("challenges") is not None or item.get("textExtra") is None]
+    for item in comparable:
+        assert prep_hashtags_with_filter(Scraper(), item) == _prep_hashtags_and_mentions(Scraper(), item)
+
+    mean_filter = bench(prep_hashtags_with_filter, comparable, args.repeat)
+    mean_index = bench(_prep_hashtags_and_mentions, comparable, args.repeat)
+    n_hashtags = sum(len(item.get("textExtra") or []) for item in comparable) / max(len(comparable), 1)
+    print(f"{len(comparable)} items, {n_hashtags:.1f} text elements on average")
+    print(f"filter(): {mean_filter * 1e6:8.1f} us per item")
+    print(f"index:    {mean_index * 1e6:8.1f} us per item ({mean_filter / mean_index:.1f}x faster)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compares the streaming rehydration extractor with the BeautifulSoup path
+that TT_Scraper.scrape used before.
+
+Run from metadata/scraper/:
+    python -m benchmarks.bench_rehydration data/recorded/*.html
+
+Without arguments a synthetic page is used.
+"""
+import argparse
+import json
+import time
+
+from bs4 import BeautifulSoup
+
+from TT_Scraper._extract_rehydration import extract_rehydration_data, CHUNK_SIZE
+
+def parse_with_bs4(page):
+    soup = BeautifulSoup(page.decode("utf-8"), "html.parser")
+    tt_script = soup.find('script', attrs={'id':"__UNIVERSAL_DATA_FOR_REHYDRATION__"})
+    return json.loads(tt_script.string)
+
+def parse_with_extractor(page):
+    chunks = (page[i:i + CHUNK_SIZE] for i in range(0, len(page), CHUNK_SIZE))
+    return extract_rehydration_data(chunks)
+
+def synthetic_page():
+    item_struct = {"id": "7398323154424171806", "desc": "#wahl " * 50, "stats": {"playCount": 1}}
+    data = {"__DEFAULT_SCOPE__": {"webapp.video-detail": {"itemInfo": {"itemStruct": item_struct}}}}
+    filler = "".join(f'<div class="c{i}"><span>{i}</span><a href="/x/{i}">link</a></div>' for i in range(10_000))
+    return (f'<html><head><script>window.x = 1;</script></head><body>{filler}'
+            f'<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">{json.dumps(data)}</script>'
+            f'</body></html>').encode("utf-8")
+
+def bench(parse, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            parse(page)
+    return (time.perf_counter() - start) / (repeat * len(pages))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark rehydration JSON extraction')
+    parser.add_argument('pages', nargs='*', help='Recorded TikTok HTML pages')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions per page (default: 5)')
+    args = parser.parse_args()
+
+    pages = []
+    for path in args.pages:
+        with open(path, 'rb') as f:
+            pages.append(f.read())
+    if not pages:
+        pages = [synthetic_page()]
+
+    for page in pages:
+        assert parse_with_bs4(page) == parse_with_extractor(page)
+
+    mean_bs4 = bench(parse_with_bs4, pages, args.repeat)
+    mean_extractor = bench(parse_with_extractor, pages, args.repeat)
+    print(f"{len(pages)} pages, {sum(len(p) for p in pages) / len(pages) / 1024:.0f} KiB on average")
+    print(f"BeautifulSoup: {mean_bs4 * 1000:8.2f} ms per page")
+    print(f"Extractor:     {mean_extractor * 1000:8.2f} ms per page ({mean_bs4 / mean_extractor:.0f}x faster)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Runs scrape_list against the local stand-in server (benchmarks/standin_server.py) and reports
+items per second, CPU time and peak RSS of the scraper. The server runs in its own process,
+so its CPU time is not counted.
+
+Run from metadata/scraper/:
+    python -m benchmarks.bench_scrape data/recorded/ --max_in_flight 8 --latency 0.05 --bandwidth 5e6
+
+Without an archive, synthetic posts are used (--synthetic 200).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.standin_server import StandInServer, video_ids, write_synthetic_archive
+
+def serve(archive_fp, server_kw, ready, stop, results):
+    server = StandInServer(archive_fp, **server_kw)
+    ready.put(server.base_url)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    stop.wait()
+    server.shutdown()
+    server.server_close()
+    results.put(server.stats)
+
+def peak_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark scrape_list against a local stand-in server')
+    parser.add_argument('archive_fp', nargs='?', help='Archive recorded with scrape_list(record_fp=...)')
+    parser.add_argument('--synthetic', type=int, default=200, help='Number of synthetic posts without archive (default: 200)')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds before every response (default: 0.05)')
+    parser.add_argument('--bandwidth', type=float, default=None, help='Bytes per second and response (default: unlimited)')
+    parser.add_argument('--forbidden_rate', type=float, default=0, help='Share of requests answered with 403 (default: 0)')
+    parser.add_argument('--missing_rehydration_rate', type=float, default=0, help='Share of pages without rehydration script (default: 0)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the failures (default: 0)')
+    parser.add_argument('--max_in_flight', type=int, default=1, help='Concurrent videos (default: 1)')
+    parser.add_argument('--requests_per_second', type=float, default=None, help='Global request budget (default: none)')
+    parser.add_argument('--wait_time', type=float, default=0, help='Sleep per iteration without request budget (default: 0)')
+    parser.add_argument('--stream_content', action='store_true', help='Stream media to disk')
+    parser.add_argument('--writer_threads', type=int, default=0, help='Background writer threads (default: 0)')
+    parser.add_argument('--retry_base_delay', type=float, default=0.1, help='First retry delay in seconds (default: 0.1)')
+    parser.add_argument('--no_content', action='store_true', help='Only scrape metadata')
+    parser.add_argument('--results', default=None, help='Append the results as a JSON line to this file')
+    args = parser.parse_args()
+
+    from TT_Scraper import TT_Scraper
+
+    tmp_fp = tempfile.mkdtemp(prefix="bench_scrape_")
+    archive_fp = args.archive_fp
+    if archive_fp is None:
+        archive_fp = os.path.join(tmp_fp, "archive")
+        write_synthetic_archive(archive_fp, args.synthetic)
+    ids = video_ids(archive_fp)
+
+    context = multiprocessing.get_context("spawn")
+    ready, results, stop = context.Queue(), context.Queue(), context.Event()
+    server_kw = {"latency": args.latency, "bandwidth": args.bandwidth, "forbidden_rate": args.forbidden_rate,
+                 "missing_rehydration_rate": args.missing_rehydration_rate, "seed": args.seed}
+    server = context.Process(target=serve, args=(archive_fp, server_kw, ready, stop, results), daemon=True)
+    server.start()
+    try:
+        base_url = ready.get(timeout=60)
+        tt = TT_Scraper(wait_time=args.wait_time, output_files_fp=os.path.join(tmp_fp, "out", ""), base_url=base_url)
+        tt.RETRY_BASE_DELAY = args.retry_base_delay
+        tt.log.setLevel("WARNING")
+
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        start = time.perf_counter()
+        tt.scrape_list(ids, scrape_content=not args.no_content, clear_console=False, max_in_flight=args.max_in_flight,
+                       requests_per_second=args.requests_per_second, stream_content=args.stream_content,
+                       writer_threads=args.writer_threads, resume=False)
+        elapsed = time.perf_counter() - start
+        usage_after = resource.getrusage(resource.RUSAGE_SELF)
+        stop.set()
+        server_stats = results.get(timeout=60)
+    finally:
+        stop.set()
+        server.join(timeout=10)
+        shutil.rmtree(tmp_fp, ignore_errors=True)
+
+    cpu = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    result = {"items": len(ids), "seconds": round(elapsed, 3), "items_per_second": round(len(ids) / elapsed, 2),
+              "cpu_seconds": round(cpu, 3), "cpu_ms_per_item": round(cpu * 1000 / len(ids), 2),
+              "peak_rss_mb": round(peak_rss_bytes() / 1e6, 1), "errors": tt.total_errors,
+              "mb_received": round(tt.bytes_received / 1e6, 1), "server": server_stats, "settings": vars(args)}
+    print(f"{result['items']} items in {elapsed:.1f} s: {result['items_per_second']:.1f} items/s")
+    print(f"CPU: {cpu:.2f} s ({result['cpu_ms_per_item']:.1f} ms per item), peak RSS: {result['peak_rss_mb']:.0f} MB")
+    print(f"errors: {tt.total_errors}, received: {result['mb_received']} MB, server: {server_stats}")
+    if args.results:
+        with open(args.results, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+
+if __name__ == "__main__":
+    main()
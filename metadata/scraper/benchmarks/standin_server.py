@@ -0,0 +1,191 @@
+"""
+Local stand-in for TikTok that replays an archive recorded with scrape_list(record_fp=...).
+A scraper created with TT_Scraper(base_url="http://127.0.0.1:<port>") requests
+https://<host>/<path> as /<host>/<path>, the response recorded for that URL is replayed.
+
+Run from metadata/scraper/:
+    python -m benchmarks.standin_server data/recorded/ --port 8000 --latency 0.05 --bandwidth 5e6 --forbidden_rate 0.01
+
+Whether a request gets a 403 or a page without rehydration script is drawn per URL and attempt
+from --seed, so runs with the same archive and settings see the same failures.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from TT_Scraper._extract_rehydration import REHYDRATION_SCRIPT_ID
+from TT_Scraper.HTML_Scraper._response_recorder import ResponseRecorder, load_archive, body_path
+
+CHUNK_SIZE = 64 * 1024
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        key = self.path.lstrip("/")
+        entry = server.entries.get(key)
+        attempt = server.count_request(key)
+        if server.latency:
+            time.sleep(server.latency)
+
+        if entry is None:
+            server.count("not_found")
+            return self._send(404, {"Content-Type": "text/plain"}, b"not recorded")
+        draw = random.Random(f"{server.seed}:{key}:{attempt}").random()
+        if draw < server.forbidden_rate:
+            server.count("forbidden")
+            return self._send(403, {"Content-Type": "text/html"}, b"<html>Access Denied</html>")
+
+        body = server.read_body(entry["body"])
+        if REHYDRATION_SCRIPT_ID in body and draw < server.forbidden_rate + server.missing_rehydration_rate:
+            # like the pages TikTok serves when it blocks a client
+            server.count("missing_rehydration")
+            body = body.replace(REHYDRATION_SCRIPT_ID, b"__REMOVED__")
+        self._send(entry["status"], entry["headers"], body)
+
+    def _send(self, status, headers, body):
+        self.send_response(status)
+        for key, value in headers.items():
+            # send_response() adds its own
+            if key.lower() not in ("server", "date"):
+                self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        start = time.perf_counter()
+        try:
+            for offset in range(0, len(body), CHUNK_SIZE):
+                chunk = body[offset:offset + CHUNK_SIZE]
+                self.wfile.write(chunk)
+                if self.server.bandwidth:
+                    delay = (offset + len(chunk)) / self.server.bandwidth - (time.perf_counter() - start)
+                    if delay > 0:
+                        time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            # the scraper stops reading HTML pages after the rehydration script
+            self.close_connection = True
+            return None
+        self.server.count("responses")
+        self.server.count("bytes_sent", len(body))
+
+    def log_message(self, format, *args):
+        pass
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    Replays the archive in archive_fp (see ResponseRecorder).
+    latency: seconds before every response, bandwidth: bytes per second and response (None = unlimited),
+    forbidden_rate: share of requests answered with 403, missing_rehydration_rate: share of HTML pages
+    served without rehydration script. Bodies are cached in memory. Counters are in self.stats.
+    """
+    daemon_threads = True
+
+    def __init__(self, archive_fp, port = 0, latency = 0, bandwidth = None, forbidden_rate = 0, missing_rehydration_rate = 0, seed = 0):
+        self.archive_fp = archive_fp
+        self.entries = load_archive(archive_fp)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.forbidden_rate = forbidden_rate
+        self.missing_rehydration_rate = missing_rehydration_rate
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.bodies = {}
+        self.attempts = {}
+        self.stats = {"requests": 0, "responses": 0, "bytes_sent": 0, "forbidden": 0, "missing_rehydration": 0, "not_found": 0}
+        super().__init__(("127.0.0.1", port), StandInHandler)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def read_body(self, sha256):
+        body = self.bodies.get(sha256)
+        if body is None:
+            with open(body_path(self.archive_fp, sha256), "rb") as f:
+                body = f.read()
+            self.bodies[sha256] = body
+        return body
+
+    def count_request(self, key):
+        with self.lock:
+            self.stats["requests"] += 1
+            attempt = self.attempts.get(key, 0)
+            self.attempts[key] = attempt + 1
+        return attempt
+
+    def count(self, name, n = 1):
+        with self.lock:
+            self.stats[name] += n
+
+def video_ids(archive_fp):
+    """
+    IDs of all videos whose page is in the archive.
+    """
+    ids = []
+    for key in load_archive(archive_fp):
+        path = key.split("?", 1)[0]
+        if path.startswith("www.tiktok.com/") and "/video/" in path:
+            ids.append(path.rsplit("/", 1)[1])
+    return ids
+
+def write_synthetic_archive(archive_fp, n_items = 200, slide_every = 5, video_bytes = 2 * 1024**2, picture_bytes = 200 * 1024, page_filler = 200_000):
+    """
+    Writes an archive of n_items synthetic posts (every slide_every-th one a slide with three pictures),
+    for runs without a recorded archive. Media bodies are shared, pages are about page_filler bytes.
+    """
+    recorder = ResponseRecorder(archive_fp)
+    video_body = os.urandom(video_bytes)
+    picture_body = os.urandom(picture_bytes)
+    audio_body = os.urandom(picture_bytes)
+    filler = "<div>" + "x" * page_filler + "</div>"
+    for i in range(n_items):
+        id = str(7398323154424171806 + i)
+        is_slide = slide_every and i % slide_every == 0
+        item_struct = {"id": id, "createTime": str(1700000000 + i), "desc": f"Wahlkampf #btw25 #{i}",
+                       "author": {"id": str(6869180186235634694 + i % 50), "uniqueId": f"user{i % 50}", "nickname": "Name"},
+                       "music": {"id": str(7000000000000000000 + i % 20), "title": "original sound", "authorName": "Name",
+                                 "playUrl": f"https://sf16-ies-music.tiktokcdn.com/obj/{i % 20}.mp3"},
+                       "textExtra": [{"hashtagName": "btw25", "hashtagId": "1"}], "challenges": [{"id": "1", "desc": "Bundestagswahl"}],
+                       "video": {"playAddr": "" if is_slide else f"https://v16-webapp.tiktok.com/video/{id}.mp4",
+                                 "downloadAddr": "", "duration": 30, "ratio": "540p"},
+                       "stats": {"diggCount": 10, "shareCount": 1, "commentCount": 2, "playCount": 300, "collectCount": 0}}
+        if is_slide:
+            item_struct["imagePost"] = {"images": [{"imageURL": {"urlList": [f"https://p16-sign.tiktokcdn.com/{id}/{k}.jpeg"]}} for k in range(3)]}
+            for k in range(3):
+                recorder.add(f"https://p16-sign.tiktokcdn.com/{id}/{k}.jpeg", 200, {"Content-Type": "image/jpeg"}, picture_body)
+            recorder.add(item_struct["music"]["playUrl"], 200, {"Content-Type": "audio/mpeg"}, audio_body)
+        else:
+            recorder.add(item_struct["video"]["playAddr"], 200, {"Content-Type": "video/mp4"}, video_body)
+        data = {"__DEFAULT_SCOPE__": {"webapp.video-detail": {"itemInfo": {"itemStruct": item_struct}}}}
+        page = (f'<html><head></head><body>{filler}<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">'
+                f'{json.dumps(data)}</script>{filler}</body></html>').encode("utf-8")
+        recorder.add(f"https://www.tiktok.com/@tiktok/video/{id}", 200, {"Content-Type": "text/html; charset=utf-8"}, page)
+    recorder.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded response archive as a local TikTok stand-in')
+    parser.add_argument('archive_fp', help='Archive recorded with scrape_list(record_fp=...)')
+    parser.add_argument('--port', type=int, default=8000, help='Port (default: 8000)')
+    parser.add_argument('--latency', type=float, default=0, help='Seconds before every response (default: 0)')
+    parser.add_argument('--bandwidth', type=float, default=None, help='Bytes per second and response (default: unlimited)')
+    parser.add_argument('--forbidden_rate', type=float, default=0, help='Share of requests answered with 403 (default: 0)')
+    parser.add_argument('--missing_rehydration_rate', type=float, default=0, help='Share of pages without rehydration script (default: 0)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the failures (default: 0)')
+    args = parser.parse_args()
+
+    server = StandInServer(args.archive_fp, args.port, args.latency, args.bandwidth, args.forbidden_rate, args.missing_rehydration_rate, args.seed)
+    print(f"Replaying {len(server.entries):,} responses on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(server.stats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import argparse
+import os
+
+from TT_Scraper._completion_journal import CompletionJournal, JOURNAL_FILENAME
+
+# Rewrites the completion journal of an output folder with one line per ID.
+# Run from metadata/scraper/:
+#   python compact_journal.py --output_files_fp data/
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compact the completion journal of a scraper output folder.')
+    parser.add_argument('--output_files_fp', default='data/', help='Output folder of the scraper (default: data/)')
+    args = parser.parse_args()
+
+    path = os.path.join(args.output_files_fp, JOURNAL_FILENAME)
+    with open(path, 'r', encoding='utf-8') as f:
+        n_lines = sum(1 for _ in f)
+    journal = CompletionJournal(path)
+    journal.compact()
+    journal.close()
+    print(f'Compacted {path}: {n_lines:,} -> {len(journal):,} lines')
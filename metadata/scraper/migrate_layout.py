@@ -0,0 +1,19 @@
+import argparse
+
+from TT_Scraper import migrate_output
+
+# Converts a flat output folder into the sharded layout and/or moves its media into pack files.
+# Run from metadata/scraper/:
+#   python migrate_layout.py --output_files_fp data/ --layout sharded
+#   python migrate_layout.py --output_files_fp data/ --packfile
+# Afterwards scrape into the folder with TT_Scraper(output_files_fp="data/", layout="sharded", packfile=True).
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Migrate a flat scraper output folder to another storage layout.')
+    parser.add_argument('--output_files_fp', default='data/', help='Output folder of the scraper (default: data/)')
+    parser.add_argument('--layout', choices=['flat', 'sharded'], default='sharded', help='Layout of the metadata (and media) files (default: sharded)')
+    parser.add_argument('--packfile', action='store_true', help='Append media files to pack files in <output_files_fp>/packs/')
+    args = parser.parse_args()
+
+    n_files = migrate_output(args.output_files_fp, layout=args.layout, packfile=args.packfile)
+    print(f'Migrated {n_files:,} files in {args.output_files_fp}')
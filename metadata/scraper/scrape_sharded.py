@@ -0,0 +1,43 @@
+import argparse
+import sys
+
+from TT_Scraper import scrape_sharded, scrape_shard, merge_shards, SHARD_SINKS
+
+# Scrapes a list of IDs (one per line) with several worker processes.
+# Run from metadata/scraper/:
+#   python scrape_sharded.py --ids_fp ids.txt --n_shards 4 --requests_per_second 4
+# Restart a single (killed) shard, e.g. on another machine, and merge it afterwards:
+#   python scrape_sharded.py --ids_fp ids.txt --n_shards 4 --shard 2 --requests_per_second 1
+#   python scrape_sharded.py --merge_only
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scrape TikTok IDs with several sharded worker processes.')
+    parser.add_argument('--ids_fp', help='Text file with one video ID per line')
+    parser.add_argument('--n_shards', type=int, default=4, help='Number of shards (default: 4)')
+    parser.add_argument('--shard', type=int, default=None, help='Only run this shard (0-based) in this process')
+    parser.add_argument('--output_files_fp', default='data/', help='Merged output folder (default: data/)')
+    parser.add_argument('--requests_per_second', type=float, default=None, help='Total request budget, per shard with --shard')
+    parser.add_argument('--max_in_flight', type=int, default=1, help='Concurrent videos per shard (default: 1)')
+    parser.add_argument('--no_content', action='store_true', help='Only scrape metadata')
+    parser.add_argument('--layout', choices=['flat', 'sharded'], default='flat', help='Storage layout of every shard (default: flat)')
+    parser.add_argument('--packfile', action='store_true', help='Append media files to pack files in every shard')
+    parser.add_argument('--metadata_sink', choices=list(SHARD_SINKS), default=None, help='Metadata sink of every shard (default: one JSON file per video)')
+    parser.add_argument('--merge_only', action='store_true', help='Only merge the shard folders')
+    args = parser.parse_args()
+
+    if args.merge_only:
+        print(f'Merged {merge_shards(args.output_files_fp):,} IDs into {args.output_files_fp}')
+    else:
+        with open(args.ids_fp, 'r', encoding='utf-8') as f:
+            ids = [line.strip() for line in f if line.strip()]
+        scrape_kwargs = {'scrape_content': not args.no_content, 'max_in_flight': args.max_in_flight, 'clear_console': False,
+                         'layout': args.layout, 'packfile': args.packfile, 'metadata_sink': args.metadata_sink}
+        if args.shard is not None:
+            scrape_shard(ids, args.shard, args.n_shards, args.output_files_fp, requests_per_second=args.requests_per_second, **scrape_kwargs)
+        else:
+            exitcodes = scrape_sharded(ids, args.n_shards, args.output_files_fp, requests_per_second=args.requests_per_second, **scrape_kwargs)
+            failed = [shard for shard, exitcode in exitcodes.items() if exitcode != 0]
+            if failed:
+                print(f'Shards {failed} did not finish (exit codes {[exitcodes[shard] for shard in failed]}), '
+                      f'restart them with --shard and merge with --merge_only')
+                sys.exit(1)
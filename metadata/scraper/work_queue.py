@@ -0,0 +1,39 @@
+import argparse
+
+from TT_Scraper import TT_Scraper, WorkQueue
+
+# Local work queue for several scraper workers (processes or terminals) on one machine.
+# Run from metadata/scraper/:
+#   python work_queue.py add --ids_fp ids.txt
+#   python work_queue.py work --output_files_fp data/ --max_in_flight 4     (start as many as you like)
+#   python work_queue.py status
+#   python work_queue.py requeue_errors
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='SQLite work queue of TikTok IDs for scraper workers.')
+    parser.add_argument('command', choices=['add', 'work', 'status', 'requeue_errors'])
+    parser.add_argument('--queue_fp', default='work_queue.sqlite', help='SQLite file of the queue (default: work_queue.sqlite)')
+    parser.add_argument('--ids_fp', help='add: text file with one video ID per line')
+    parser.add_argument('--lease_seconds', type=float, default=300, help='Lease timeout in seconds (default: 300)')
+    parser.add_argument('--worker_id', default=None, help='work: name of the worker (default: <host>-<pid>)')
+    parser.add_argument('--lease_size', type=int, default=20, help='work: IDs leased at a time (default: 20)')
+    parser.add_argument('--output_files_fp', default='data/', help='work: output folder (default: data/)')
+    parser.add_argument('--max_in_flight', type=int, default=1, help='work: concurrent videos (default: 1)')
+    parser.add_argument('--requests_per_second', type=float, default=None, help='work: request budget of this worker')
+    parser.add_argument('--no_content', action='store_true', help='work: only scrape metadata')
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.queue_fp, lease_seconds=args.lease_seconds)
+    if args.command == 'add':
+        with open(args.ids_fp, 'r', encoding='utf-8') as f:
+            print(f'Added {queue.add(line.strip() for line in f if line.strip()):,} IDs')
+    elif args.command == 'work':
+        tt = TT_Scraper(output_files_fp=args.output_files_fp)
+        tt.scrape_from_queue(queue, worker_id=args.worker_id, lease_size=args.lease_size,
+                             scrape_content=not args.no_content, max_in_flight=args.max_in_flight,
+                             requests_per_second=args.requests_per_second)
+        tt.close()
+    elif args.command == 'requeue_errors':
+        print(f'Requeued {queue.requeue_errors():,} IDs')
+    print(queue.counts())
+    queue.close()
@@ -0,0 +1,117 @@
+"""
+Compares the step lookup and blueprint extraction of generate_overview.process_participant
+with the per-participant DataFrame.query it replaced, on synthetic participants.
+
+Run from the repository root:
+    python -m monitoring.benchmarks.bench_participant_lookup --participants 50000
+
+The query version is O(n) per participant, so both lookups are timed on the same
+--sample participants and extrapolated to all of them (plus building the index once).
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from monitoring.scripts.generate_overview import get_participant_steps, prepare_blueprints, extract_blueprint_information
+
+BLUEPRINT_DATA = [{'id': 1, 'name': 'Angesehene Videos'}, {'id': 2, 'name': 'Likes'}, {'id': 3, 'name': 'Suchen'},
+                  {'id': 4, 'name': 'Kommentare'}, {'id': 5, 'name': 'Geteilte Videos'}]
+
+
+def synthetic_participants(n_participants, seed=0):
+    rng = random.Random(seed)
+    return pd.DataFrame({'participant_id': [f'{rng.getrandbits(64):016x}' for _ in range(n_participants)],
+                         'current_step': [rng.choice([0, 1, 2, 3]) for _ in range(n_participants)],
+                         'completed': [rng.random() < 0.7 for _ in range(n_participants)]})
+
+
+def synthetic_donation(i):
+    # the last blueprint is not donated, the previous version fails on blueprints missing in the donation
+    donation = {'blueprints': {str(blueprint['id']): {'donations': [{'consent': True, 'status': 'success', 'data': [0] * (i % 50)}]}
+                               for blueprint in BLUEPRINT_DATA[:4]}}
+    donation['blueprints'][str(BLUEPRINT_DATA[4]['id'])] = {'donations': []}
+    return donation
+
+
+def legacy_step(participant, participation_overview):
+    return participation_overview.query(f'participant_id == "{participant}"')['current_step'].iloc[0]
+
+
+def legacy_extract_blueprint_information(blueprint, donation):
+    # previous version of generate_overview.extract_blueprint_information, unchanged
+    bp_id = str(blueprint['id'])
+    bp_name = blueprint['name'].replace(' ', '')
+
+    bp_donation = donation['blueprints'].get(bp_id, {})
+    if len(bp_donation['donations']) == 0:
+        return {
+            f'{bp_name}_consent': None,
+            f'{bp_name}_status': None,
+            f'{bp_name}_n_datapoints': None,
+        }
+    donation_info = bp_donation['donations'][0]
+    if bp_donation:
+        donated_data = len(donation_info['data'])
+    else:
+        donated_data = None
+
+    return {
+        f'{bp_name}_consent': donation_info.get('consent'),
+        f'{bp_name}_status': donation_info.get('status'),
+        f'{bp_name}_n_datapoints': donated_data,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the participant lookup of generate_overview')
+    parser.add_argument('--participants', type=int, default=50_000, help='Synthetic participants (default: 50000)')
+    parser.add_argument('--sample', type=int, default=500, help='Participants timed with DataFrame.query (default: 500)')
+    args = parser.parse_args()
+
+    df = synthetic_participants(args.participants)
+    participants = df['participant_id'].tolist()
+    sample = random.Random(1).sample(participants, min(args.sample, len(participants)))
+    donations = [synthetic_donation(i) for i in range(1000)]
+
+    start = time.perf_counter()
+    legacy_steps = [legacy_step(participant, df) for participant in sample]
+    legacy_per_participant = (time.perf_counter() - start) / len(sample)
+
+    start = time.perf_counter()
+    participant_steps = get_participant_steps(df)
+    index_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed_steps = [participant_steps[participant] for participant in sample]
+    indexed_per_participant = (time.perf_counter() - start) / len(sample)
+    assert legacy_steps == indexed_steps
+
+    start = time.perf_counter()
+    for i in range(len(participants)):
+        d = {}
+        for blueprint in BLUEPRINT_DATA:
+            d.update(legacy_extract_blueprint_information(blueprint, donations[i % len(donations)]))
+    legacy_blueprints_total = time.perf_counter() - start
+
+    start = time.perf_counter()
+    blueprints = prepare_blueprints(BLUEPRINT_DATA)
+    for i in range(len(participants)):
+        d_new = {}
+        for blueprint in blueprints:
+            d_new.update(extract_blueprint_information(blueprint, donations[i % len(donations)]))
+    blueprints_total = time.perf_counter() - start
+    assert d == d_new
+
+    legacy_total = legacy_per_participant * len(participants)
+    indexed_total = index_time + indexed_per_participant * len(participants)
+    print(f'{len(participants):,} participants, lookups timed on the same {len(sample)} and extrapolated')
+    print(f'step lookup, DataFrame.query: {legacy_total:8.2f} s ({legacy_per_participant * 1e3:.2f} ms per participant)')
+    print(f'step lookup, dict:            {indexed_total:8.3f} s incl. {index_time:.3f} s building the index ({legacy_total / indexed_total:,.0f}x faster)')
+    print(f'blueprints, per call names:   {legacy_blueprints_total:8.3f} s')
+    print(f'blueprints, prebuilt:         {blueprints_total:8.3f} s ({legacy_blueprints_total / blueprints_total:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,21 @@
+import argparse
 import json
 import sys
 
 import pandas as pd
 import os
-import time
+import requests
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from dotenv import load_dotenv
 from rich.console import Console
 from tqdm import tqdm
 
-from monitoring.utils.data_request import request_data
-from monitoring.utils.utils import save_json_file, flatten_responses
+from metadata.scraper.TT_Scraper import ThroughputTracker, RateLimiter
+from monitoring.utils.data_request import request_data, request_data_with_retries
+from monitoring.utils.utils import atomic_write, save_json_file, flatten_responses
+from monitoring.utils.participant_ledger import ParticipantLedger, state_hash, file_hash
 
 
 console = Console()
@@ -68,6 +72,9 @@ def load_donation_overview():
     :return: A list of dictionaries.
     """
     overview_path = './data/overview/donation_overview.json'
+    if not os.path.exists(overview_path):
+        # where earlier versions saved it
+        overview_path = './data/donations/donation_overview.json'
     if not os.path.exists(overview_path):
         return []
 
@@ -75,33 +82,72 @@ def load_donation_overview():
         return json.load(json_file)
 
 
-def download_donation(endpoint, token, participant_id):
+# Requests per second to the donation endpoint, shared by all download workers.
+DOWNLOAD_RATE = 2
+download_rate_limiter = RateLimiter(DOWNLOAD_RATE)
+
+
+def download_donation(endpoint, token, participant_id, verbose=True, force=False):
     """
     Checks if the donation of the participant has already been downloaded to
     disk. If not, downloads it through the DDM API.
+    Transient errors are retried, the file is written atomically.
 
     :param endpoint: URL of API endpoint.
     :param token: Project API Token.
     :param participant_id: External participant ID.
+    :param verbose: Print the status of the participant.
+    :param force: Download again even if the file exists (e.g. the donation changed).
     :return: None
     """
 
     # Check if donation file already exists.
     path = f'./data/donations/{participant_id}.json'
-    if os.path.exists(path):
-        print_to_console(f'[cyan]Processing {participant_id}: [bold green]Data for participant already downloaded.')
+    if os.path.exists(path) and not force:
+        if verbose:
+            print_to_console(f'[cyan]Processing {participant_id}: [bold green]Data for participant already downloaded.')
         return
 
     # If not, download.
-    print_to_console(f'[cyan]Processing {participant_id}: [bold yellow]Downloading data from DDM.')
+    if verbose:
+        print_to_console(f'[cyan]Processing {participant_id}: [bold yellow]Downloading data from DDM.')
 
     payload = {'participants': participant_id}
-    donation_data = request_data(endpoint, token, payload, timeout=20)
+    donation_data = request_data_with_retries(endpoint, token, payload, timeout=20, rate_limiter=download_rate_limiter)
     save_json_file(path, donation_data)
-    time.sleep(0.5)
     return
 
 
+def download_donations(participants, workers, force=()):
+    """
+    Downloads the donations of several participants concurrently with
+    `workers` threads, within the shared rate limit of DOWNLOAD_RATE.
+
+    :param participants: External participant IDs.
+    :param workers: Number of concurrent downloads.
+    :param force: Participant IDs whose files are downloaded again.
+    :return: The participant IDs whose download failed.
+    """
+    failed = []
+    pbar = tqdm(total=len(participants), dynamic_ncols=True, position=0, leave=True, colour="cyan", desc='Downloading')
+    tracker = ThroughputTracker(total=len(participants))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(download_donation, DONATION_ENDPOINT, API_KEY, participant, False, participant in force): participant
+                   for participant in participants}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                tracker.update()
+            except requests.exceptions.RequestException as e:
+                console.print(f'[bold red]Download for {futures[future]} failed: {e}')
+                failed.append(futures[future])
+                tracker.update(errors=1)
+            pbar.set_postfix(tracker.postfix(), refresh=False)
+            pbar.update(1)
+    pbar.close()
+    return failed
+
+
 def exclude_unhandled_participants(donation_overview):
     return [p for p in donation_overview if p['handled']]
 
@@ -116,54 +162,203 @@ def get_participants_to_handle(donation_overview, df_participants):
     return list(set(all_participants) - set(handled_participants))
 
 
+def get_participant_steps(df_participants):
+    """
+    Current step of every participant, keyed by participant ID.
+    :param df_participants: The participation overview from DDM.
+    :return: A dict {participant_id: current_step}, the first row of a participant listed twice counts.
+    """
+    df_participants = df_participants.drop_duplicates('participant_id', keep='first')
+    return dict(zip(df_participants['participant_id'], df_participants['current_step']))
+
+
+def prepare_blueprints(blueprint_data):
+    """
+    Blueprint ID and overview column names of every blueprint, built once for all participants.
+    :param blueprint_data: The blueprints from the DDM overview.
+    :return: A list of (blueprint ID, consent column, status column, n_datapoints column).
+    """
+    blueprints = []
+    for blueprint in blueprint_data:
+        bp_name = blueprint['name'].replace(' ', '')
+        blueprints.append((str(blueprint['id']), f'{bp_name}_consent', f'{bp_name}_status', f'{bp_name}_n_datapoints'))
+    return blueprints
+
+
 def extract_blueprint_information(blueprint, donation):
-    bp_id = str(blueprint['id'])
-    bp_name = blueprint['name'].replace(' ', '')
+    bp_id, consent_column, status_column, n_datapoints_column = blueprint
 
     bp_donation = donation['blueprints'].get(bp_id, {})
-    if len(bp_donation['donations']) == 0:
+    if len(bp_donation.get('donations', [])) == 0:
         return {
-            f'{bp_name}_consent': None,
-            f'{bp_name}_status': None,
-            f'{bp_name}_n_datapoints': None,
+            consent_column: None,
+            status_column: None,
+            n_datapoints_column: None,
         }
     donation_info = bp_donation['donations'][0]
-    if bp_donation:
-        donated_data = len(donation_info['data'])
-    else:
-        donated_data = None
 
     return {
-        f'{bp_name}_consent': donation_info.get('consent'),
-        f'{bp_name}_status': donation_info.get('status'),
-        f'{bp_name}_n_datapoints': donated_data,
+        consent_column: donation_info.get('consent'),
+        status_column: donation_info.get('status'),
+        n_datapoints_column: len(donation_info['data']),
     }
 
 
-def process_participant(participant, blueprint_data, participation_overview):
+def process_participant(participant, blueprints, participant_steps, force_download=False):
     print_to_console(f'[cyan]Processing {participant}: [bold yellow]Starting.')
 
     d = dict()
     d['participant_id'] = participant
 
     # Check step of participant in participation_overview
-    step = participation_overview.query(f'participant_id == "{participant}"')['current_step'].iloc[0]
+    step = participant_steps.get(participant, 0)
     if step < 2:
         print_to_console(f'[cyan]Processing {participant}: [bold yellow]Donation not finished - no download.')
         d['handled'] = False
         return d.copy()
 
-    download_donation(DONATION_ENDPOINT, API_KEY, participant)
+    try:
+        download_donation(DONATION_ENDPOINT, API_KEY, participant, force=force_download)
+    except requests.exceptions.RequestException:
+        # retried with the next run
+        print_to_console(f'[cyan]Processing {participant}: [bold red]Download failed.')
+        d['handled'] = False
+        return d.copy()
     with open(f'./data/donations/{participant}.json', 'r') as json_file:
         donation = json.load(json_file)
 
-    for blueprint in blueprint_data:
+    for blueprint in blueprints:
         d.update(extract_blueprint_information(blueprint, donation))
 
     d['handled'] = True
     return d.copy()
 
 
+def get_state_hashes(df_participants, df_responses):
+    """
+    Hash of the participation overview and response rows of every participant.
+    :return: A dict {participant_id: state hash}.
+    """
+    rows = {}
+    for row in df_participants.to_dict('records'):
+        rows.setdefault(row['participant_id'], ([], []))[0].append(row)
+    for row in df_responses.to_dict('records'):
+        rows.setdefault(row['participant_id'], ([], []))[1].append(row)
+    return {participant: state_hash(*participant_rows) for participant, participant_rows in rows.items()}
+
+
+def get_changed_participants(ledger, state_hashes, participant_steps):
+    """
+    Participants to process in an incremental refresh: new ones, those whose DDM data changed,
+    unhandled ones with a finished donation (e.g. failed download) and those whose donation file changed.
+    :return: The changed participant IDs and those of them whose donation is downloaded again.
+    """
+    changed, redownload = [], set()
+    for participant, participant_hash in state_hashes.items():
+        state = ledger.get(participant)
+        if state is None:
+            changed.append(participant)
+        elif state['state_hash'] != participant_hash:
+            changed.append(participant)
+            if state['row'].get('handled'):
+                redownload.add(participant)
+        elif not state['row'].get('handled') and participant_steps.get(participant, 0) >= 2:
+            changed.append(participant)
+        elif ledger.donation_file_changed(participant, f'./data/donations/{participant}.json'):
+            changed.append(participant)
+    return changed, redownload
+
+
+def get_ledger_state(row, participant_hash, participant_steps, completed):
+    """
+    State of a processed participant for the ledger.
+    :param row: The participant's row of the donation overview.
+    """
+    participant = row['participant_id']
+    path = f'./data/donations/{participant}.json'
+    state = {'participant_id': participant, 'state_hash': participant_hash,
+             'step': participant_steps.get(participant), 'completed': completed.get(participant),
+             'file_hash': None, 'file_size': None, 'file_mtime_ns': None, 'row': row}
+    if row['handled'] and os.path.exists(path):
+        stat = os.stat(path)
+        state.update(file_hash=file_hash(path), file_size=stat.st_size, file_mtime_ns=stat.st_mtime_ns)
+    return state
+
+
+def update_merged_overview(path, df_participation, df_responses, df_changed, changed, participants):
+    """
+    Replaces the rows of the changed participants in the merged overview stored in path
+    (a pickled DataFrame, so the column types are kept) and removes participants no longer in DDM.
+    :param df_changed: The donation overview rows of the changed participants.
+    :param participants: All participant IDs in DDM.
+    :return: The merged overview.
+    """
+    changed = set(changed)
+    new_rows = df_participation[df_participation['participant_id'].isin(changed)].merge(
+        df_responses[df_responses['participant_id'].isin(changed)], on='participant_id', how='outer').merge(
+        df_changed, on='participant_id', how='outer')
+    if not os.path.exists(path):
+        merged_df = new_rows
+    else:
+        merged_df = pd.read_pickle(path)
+        position = {participant: i for i, participant in enumerate(merged_df['participant_id'])}
+        merged_df = merged_df[~merged_df['participant_id'].isin(changed) & merged_df['participant_id'].isin(participants)]
+        merged_df = pd.concat([merged_df, new_rows], ignore_index=True)
+        # keep the order of known participants, new ones at the end
+        order = merged_df['participant_id'].map(position).fillna(len(position))
+        merged_df = merged_df.iloc[order.argsort(kind='stable')].reset_index(drop=True)
+    with atomic_write(path, 'wb') as f:
+        merged_df.to_pickle(f)
+    return merged_df
+
+
+def refresh_incremental(df_participation, df_responses, blueprints, participant_steps, workers):
+    """
+    Processes only new and changed participants (see get_changed_participants), records their
+    state in the ledger and updates the donation overview and the merged overview in place.
+    Without a merged overview (first run, or overview.pkl was deleted) all participants are processed.
+    :return: The merged overview.
+    """
+    ledger = ParticipantLedger('./data/overview/participant_ledger.jsonl')
+    state_hashes = get_state_hashes(df_participation, df_responses)
+    changed, redownload = get_changed_participants(ledger, state_hashes, participant_steps)
+    if not os.path.exists('./data/overview/overview.pkl'):
+        # the ledger only decides which donations are downloaded again
+        changed = list(state_hashes)
+    console.print(f'[white]{len(changed)} new or changed participants, {len(ledger)} in the ledger.[/]')
+
+    if workers > 1:
+        to_download = [p for p in changed if participant_steps.get(p, 0) >= 2
+                       and (p in redownload or not os.path.exists(f'./data/donations/{p}.json'))]
+        failed = download_donations(to_download, workers, force=redownload)
+        redownload = redownload & set(failed)
+
+    completed = dict(zip(df_participation['participant_id'], df_participation['completed'])) if 'completed' in df_participation else {}
+    changed_rows = []
+    for participant in tqdm(changed, dynamic_ncols=True, colour="magenta"):
+        row = process_participant(participant, blueprints, participant_steps, force_download=participant in redownload)
+        changed_rows.append(row)
+        # a failed download is not recorded, so the participant counts as changed in the next run
+        if row['handled'] or participant_steps.get(participant, 0) < 2:
+            ledger.record(get_ledger_state(row, state_hashes[participant], participant_steps, completed))
+    ledger.compact()
+    ledger.close()
+
+    rows = {participant: state['row'] for participant, state in ledger.states.items() if participant in state_hashes}
+    rows.update({row['participant_id']: row for row in changed_rows})
+    donation_overview = list(rows.values())
+    console.print('[white]Write donation overview to disc.[/]')
+    save_json_file('./data/overview/donation_overview.json', donation_overview)
+
+    df_changed = pd.DataFrame(changed_rows) if changed_rows else pd.DataFrame(columns=['participant_id'])
+    merged_df = update_merged_overview('./data/overview/overview.pkl', df_participation, df_responses,
+                                       df_changed, changed, set(state_hashes))
+    console.print('[white]Write participation overview to disc.[/]')
+    with atomic_write('./data/overview/overview.csv', 'w', newline='') as f:
+        merged_df.to_csv(f, index=False)
+    return merged_df
+
+
 def generate_summary(df, save_usable=True):
     # Filter entries before start of data collection -> must be refined. (17th offical launch)
     df = df[df['start_time'] >= '2025-02-17']
@@ -201,8 +396,9 @@ def ensure_directories_exist():
     os.makedirs('./data/overview', exist_ok=True)
 
 
-def main():
+def main(workers=1, requests_per_second=DOWNLOAD_RATE, incremental=False):
     console.print('[white]Start script...[/]')
+    download_rate_limiter.set_rate(requests_per_second)
     
     # Create necessary directories
     ensure_directories_exist()
@@ -211,16 +407,34 @@ def main():
     df_participation, overview_data = get_participation_overview()
     df_responses = get_response_data()
 
+    blueprints = prepare_blueprints(overview_data['blueprints'])
+    participant_steps = get_participant_steps(df_participation)
+
+    if incremental:
+        merged_df = refresh_incremental(df_participation, df_responses, blueprints, participant_steps, workers)
+        generate_summary(merged_df)
+        console.print('[bold green]✅ Process finished![/]')
+        return
+
     # Check if local donation overview table already exists and load if necessary.
     donation_overview = load_donation_overview()
     donation_overview = exclude_unhandled_participants(donation_overview)
     participants_to_handle = get_participants_to_handle(donation_overview, df_participation)
-    blueprint_data = overview_data['blueprints']
+
+    # Download new donations concurrently, processing then reads them from disk.
+    if workers > 1:
+        to_download = [p for p in participants_to_handle
+                       if participant_steps[p] >= 2 and not os.path.exists(f'./data/donations/{p}.json')]
+        console.print(f'[white]Download {len(to_download)} donations with {workers} workers...[/]')
+        download_donations(to_download, workers)
 
     console.print('')
     pbar = tqdm(total=len(participants_to_handle), dynamic_ncols=True, position=0, leave=True,  colour="magenta")
+    tracker = ThroughputTracker(total=len(participants_to_handle))
     for participant in participants_to_handle:
-        donation_overview.append(process_participant(participant, blueprint_data, df_participation))
+        donation_overview.append(process_participant(participant, blueprints, participant_steps))
+        tracker.update()
+        pbar.set_postfix(tracker.postfix(), refresh=False)
         pbar.update(1)
     pbar.update(1)
 
@@ -230,7 +444,7 @@ def main():
     console.print('[bold green]✅ All participants processed![/]')
 
     console.print('[white]Write donation overview to disc.[/]')
-    save_json_file('./data/donations/donation_overview.json', donation_overview)
+    save_json_file('./data/overview/donation_overview.json', donation_overview)
 
     # Merge everything.
     df_donations = pd.DataFrame(donation_overview)
@@ -248,4 +462,12 @@ def main():
     console.print('[bold green]✅ Process finished![/]')
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Generate the participation and donation overview')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Concurrent donation downloads (default: 1)')
+    parser.add_argument('--requests_per_second', type=float, default=DOWNLOAD_RATE,
+                        help=f'Donation requests per second, shared by all workers (default: {DOWNLOAD_RATE})')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only process new and changed participants and update the overview in place')
+    args = parser.parse_args()
+    main(workers=args.workers, requests_per_second=args.requests_per_second, incremental=args.incremental)
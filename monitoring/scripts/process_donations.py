@@ -4,6 +4,7 @@ import pandas as pd
 import glob
 from tqdm import tqdm
 import argparse
+from metadata.scraper.TT_Scraper import ThroughputTracker
 from monitoring.utils.utils import json_to_df
 
 def process_donation_file(json_path, output_dir):
@@ -100,11 +101,18 @@ def main():
     successful = 0
     failed = 0
     
-    for json_file in tqdm(json_files, desc="Processing donations"):
+    pbar = tqdm(total=len(json_files), desc="Processing donations")
+    tracker = ThroughputTracker(total=len(json_files))
+    for json_file in json_files:
         if process_donation_file(json_file, args.output_dir):
             successful += 1
+            tracker.update(nbytes=os.path.getsize(json_file))
         else:
             failed += 1
+            tracker.update(nbytes=os.path.getsize(json_file), errors=1)
+        pbar.set_postfix(tracker.postfix(), refresh=False)
+        pbar.update(1)
+    pbar.close()
     
     print(f"Processing complete: {successful} successful, {failed} failed")
     print(f"CSV files saved to {args.output_dir}")
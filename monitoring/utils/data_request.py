@@ -1,6 +1,13 @@
+import time
+
 import requests
 from requests import JSONDecodeError
 
+from metadata.scraper.TT_Scraper import retry_delay
+
+# worth another attempt: rate limited or server errors
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
 
 def create_request_header(token):
     return {'Authorization': f'Token {token}'}
@@ -22,3 +29,31 @@ def request_data(endpoint, token, payload=None, timeout=None):
             'errors': ['request not okay'],
             'r': r
         }
+
+
+def request_data_with_retries(endpoint, token, payload=None, timeout=None, max_attempts=4, base_delay=2, rate_limiter=None):
+    """
+    request_data() with retries on transient errors (timeouts, connection errors,
+    429/5xx responses and truncated JSON), with exponential backoff.
+    Every attempt waits for the rate limiter (a RateLimiter shared by all threads), if given.
+    Raises the last error once max_attempts are used up.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            data = request_data(endpoint, token, payload, timeout=timeout)
+            if data.get('errors') != ['JSONDecodeError']:
+                return data
+            error = JSONDecodeError('Truncated JSON response', '', 0)
+        except requests.exceptions.HTTPError as e:
+            if e.response is None or e.response.status_code not in RETRY_STATUS_CODES:
+                raise
+            error = e
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+            error = e
+        if attempt >= max_attempts:
+            raise error
+        time.sleep(retry_delay(attempt, base_delay, max_delay=60))
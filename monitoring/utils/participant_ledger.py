@@ -0,0 +1,135 @@
+import hashlib
+import json
+import math
+import os
+import threading
+from datetime import datetime
+
+from monitoring.utils.utils import atomic_write
+
+
+def to_native(value):
+    """
+    Converts numpy/pandas values to the Python types JSON reads back (NaN to None,
+    anything else that is not JSON to its string), so a stored state equals the recorded one.
+    """
+    if isinstance(value, dict):
+        return {str(k): to_native(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_native(v) for v in value]
+    if hasattr(value, 'item') and not isinstance(value, (str, bytes)):
+        # numpy scalar
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    return str(value)
+
+
+def state_hash(*rows):
+    """
+    Hash of the DDM data of a participant (e.g. their participation overview and response rows),
+    changes whenever one of the values changes.
+    """
+    content = json.dumps(to_native(rows), sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def file_hash(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class ParticipantLedger:
+    """
+    Append-only ledger of the processed state of every participant, one JSON line per change:
+        {"participant_id": ..., "state_hash": ..., "step": ..., "completed": ...,
+         "file_hash": ..., "file_size": ..., "file_mtime_ns": ..., "row": {...}, "timestamp": ...}
+    "row" is the participant's row of the donation overview (per blueprint consent, status and
+    number of datapoints). The last line of a participant is their current state.
+    A truncated last line (killed run) is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.states = {}
+        self.n_lines = 0
+        self._load()
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    continue
+                state = json.loads(line)
+                self.states[state['participant_id']] = state
+                self.n_lines += 1
+
+    def __len__(self):
+        return len(self.states)
+
+    def get(self, participant_id):
+        return self.states.get(participant_id)
+
+    def record(self, state):
+        """
+        Appends the state of a participant, unless it equals their current state.
+        :return: True if the state was appended.
+        """
+        state = to_native(state)
+        current = self.states.get(state['participant_id'])
+        if current is not None and {k: v for k, v in current.items() if k != 'timestamp'} == state:
+            return False
+        state = dict(state, timestamp=datetime.now().isoformat(timespec='seconds'))
+        line = json.dumps(state)
+        if json.loads(line) != state:
+            # would be reported as changed again after every reload
+            raise ValueError(f'State of {state["participant_id"]} does not survive a JSON round trip')
+        with self.lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+            self.states[state['participant_id']] = state
+            self.n_lines += 1
+        return True
+
+    def donation_file_changed(self, participant_id, path):
+        """
+        Checks if the donation file differs from the recorded one.
+        The file is only hashed if its size or modification time changed.
+        """
+        state = self.states.get(participant_id)
+        if state is None or state.get('file_hash') is None:
+            return False
+        if not os.path.exists(path):
+            return True
+        stat = os.stat(path)
+        if stat.st_size == state['file_size'] and stat.st_mtime_ns == state['file_mtime_ns']:
+            return False
+        return file_hash(path) != state['file_hash']
+
+    def compact(self):
+        """
+        Rewrites the ledger with the current state of every participant only,
+        if it holds more than twice as many lines as participants.
+        """
+        with self.lock:
+            if self.n_lines <= 2 * len(self.states):
+                return
+            self.file.close()
+            with atomic_write(self.path, 'w', encoding='utf-8') as f:
+                for state in self.states.values():
+                    f.write(json.dumps(state) + '\n')
+            self.n_lines = len(self.states)
+            self.file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        with self.lock:
+            self.file.close()
@@ -5,9 +5,11 @@ from tqdm import tqdm
 import os
 import pandas as pd
 
+from metadata.scraper.TT_Scraper import atomic_write
+
 
 def save_json_file(path, data):
-    with open(path, 'w') as json_file:
+    with atomic_write(path, 'w') as json_file:
         json.dump(data, json_file, indent=4)
 
 